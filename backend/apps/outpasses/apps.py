@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class OutpassesConfig(AppConfig):
     name = 'apps.outpasses'
+
+    def ready(self):
+        import apps.outpasses.signals
+        import apps.outpasses.events
+        import apps.outpasses.gate
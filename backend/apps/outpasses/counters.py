@@ -0,0 +1,115 @@
+"""
+Per-hostel outpass status counters.
+
+OutpassStatusCounter holds one row per (hostel, status, outgoing date).
+Every status change is reported through the ``status_changed`` signal
+(see signals.py) and applied here as F() increments, so the stats
+endpoints read a handful of counter rows instead of counting Outpass.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DateField, F, Q, Sum, When
+
+from .models import Outpass, OutpassStatusCounter
+
+
+def apply_changes(changes):
+    """Apply a batch of StatusChange records to the counters atomically."""
+    deltas = Counter()
+    for change in changes:
+        if change.old_status:
+            deltas[(change.hostel_id, change.old_status, change.outgoing_date)] -= 1
+        if change.new_status:
+            deltas[(change.hostel_id, change.new_status, change.outgoing_date)] += 1
+
+    with transaction.atomic():
+        for (hostel_id, status, date), delta in sorted(deltas.items(), key=str):
+            if delta:
+                increment(OutpassStatusCounter, {'hostel_id': hostel_id, 'status': status, 'date': date}, {'count': delta})
+
+
+def increment(model, lookup, deltas, defaults=None):
+    """
+    Add ``deltas`` ({field: amount}) to the ``model`` row matching ``lookup``
+    with F() expressions, creating the row from ``lookup``, ``defaults`` and
+    ``deltas`` if it does not exist yet.
+    """
+    rows = model.objects.filter(**lookup)
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Another request created the row first
+        rows.update(**updates)
+
+
+def status_totals(hostel_id=None):
+    """
+    Return ``{status: count}`` over all dates. ``hostel_id`` limits the
+    totals to one hostel; None means every hostel.
+    """
+    counters = OutpassStatusCounter.objects.all()
+    if hostel_id is not None:
+        counters = counters.filter(hostel_id=hostel_id)
+    rows = counters.values('status').annotate(total=Sum('count')).order_by()
+    return {row['status']: row['total'] for row in rows}
+
+
+def status_summary(start, end, hostel_id=None, statuses=()):
+    """
+    Totals per status over all dates plus a per-day total for every day in
+    [start, end], in a single grouped query. Counter rows outside the window
+    are folded into one NULL-day group, so the query returns at most
+    (days + 1) rows however much history exists.
+
+    Returns ``(totals, trend)`` where ``totals`` maps ``'total'`` and each of
+    ``statuses`` to a count and ``trend`` maps each day in the window to the
+    number of outpasses going out that day.
+    """
+    counters = OutpassStatusCounter.objects.all()
+    if hostel_id is not None:
+        counters = counters.filter(hostel_id=hostel_id)
+    aggregates = {'total': Sum('count')}
+    for status in statuses:
+        aggregates[status] = Sum('count', filter=Q(status=status))
+    rows = (
+        counters.order_by()
+        .annotate(day=Case(When(date__range=(start, end), then=F('date')), output_field=DateField()))
+        .values('day')
+        .annotate(**aggregates)
+    )
+
+    totals = dict.fromkeys(aggregates, 0)
+    trend = {}
+    for row in rows:
+        for key in aggregates:
+            totals[key] += row[key] or 0
+        if row['day'] is not None:
+            trend[row['day']] = row['total'] or 0
+    return totals, trend
+
+
+def rebuild_counters():
+    """Recompute every counter from Outpass. Returns the number of counter rows."""
+    rows = (
+        Outpass.objects.order_by()
+        .values('hostel', 'status', 'outgoing_date')
+        .annotate(total=Count('id'))
+    )
+    counters = [
+        OutpassStatusCounter(
+            hostel_id=row['hostel'],
+            status=row['status'],
+            date=row['outgoing_date'],
+            count=row['total'],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        OutpassStatusCounter.objects.all().delete()
+        OutpassStatusCounter.objects.bulk_create(counters, batch_size=1000)
+    return len(counters)
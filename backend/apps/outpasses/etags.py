@@ -0,0 +1,36 @@
+"""
+Conditional GET for polled list endpoints.
+
+The ETag of a list response is derived from the request (path, query string,
+user) and a cheap fingerprint of the filtered queryset, max(updated_at) and
+count, computed with one aggregate query and without materialising the rows.
+Any save of a listed outpass bumps updated_at, and an outpass entering or
+leaving the list changes either the max or the count.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+
+# Bump when the list payload format changes so cached ETags are invalidated
+ETAG_VERSION = 1
+
+
+def list_etag(request, queryset):
+    fingerprint = queryset.order_by().aggregate(last_updated=Max('updated_at'), count=Count('pk'))
+    parts = (
+        ETAG_VERSION,
+        request.get_full_path(),
+        request.user.pk,
+        fingerprint['last_updated'].isoformat() if fingerprint['last_updated'] else '',
+        fingerprint['count'],
+    )
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(',')}
+    return '*' in candidates or etag in candidates
@@ -0,0 +1,134 @@
+"""
+Push channel for outpass status transitions.
+
+Every ``status_changed`` batch is published to a broker once the transaction
+commits. ``dashboard_events`` (views.py) holds one subscription per connected
+gate or warden screen and streams the events it may see as server-sent
+events.
+
+The default InProcessBroker only reaches subscribers served by the same
+process. A deployment running several workers points
+``settings.OUTPASS_EVENT_BROKER`` at a class with the same
+``subscribe``/``unsubscribe``/``publish`` interface backed by a shared broker.
+"""
+import asyncio
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from apps.users.models import User
+from .models import Outpass
+from .signals import status_changed
+
+# Delivered to a subscriber whose queue overflowed; it should refetch its
+# list (or follow the changes feed) instead of trusting the stream.
+RESYNC = 'resync'
+
+# Statuses each role's dashboard lists. An event is visible to a role when
+# the outpass enters or leaves one of them. Roles not listed see everything.
+ROLE_STATUSES = {
+    User.Roles.GATE_STAFF: {Outpass.Status.READY_FOR_EXIT, Outpass.Status.CHECKED_OUT},
+    User.Roles.WARDEN: {
+        Outpass.Status.APPROVED, Outpass.Status.READY_FOR_EXIT,
+        Outpass.Status.CHECKED_OUT, Outpass.Status.OVERDUE,
+    },
+    User.Roles.ACCOUNTANT: {Outpass.Status.PENDING, Outpass.Status.FEE_PENDING},
+}
+
+STAFF_ROLES = {
+    User.Roles.ADMIN, User.Roles.HM, User.Roles.ACCOUNTANT, User.Roles.WARDEN, User.Roles.GATE_STAFF,
+}
+
+
+class Subscription:
+    def __init__(self, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client: drop its backlog and ask it to resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """Fan events out to the subscriptions of this process."""
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """Must be called from the event loop that will consume the subscription."""
+        subscription = Subscription(self.maxsize)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        """Thread-safe; publishers are usually sync views running off the loop."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(subscription)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    path = getattr(settings, 'OUTPASS_EVENT_BROKER', 'apps.outpasses.events.InProcessBroker')
+    return import_string(path)()
+
+
+def events_for(changes):
+    """One event per outpass in a ``status_changed`` batch."""
+    events = {}
+    for change in changes:
+        event = events.setdefault(str(change.outpass_id), {
+            'id': str(change.outpass_id),
+            'old_status': change.old_status,
+            'hostel': str(change.hostel_id) if change.hostel_id else None,
+        })
+        # An outgoing date change arrives as a removal plus an addition
+        if change.new_status or 'status' not in event:
+            event['status'] = change.new_status
+    return list(events.values())
+
+
+def visible_to(event, role, hostel_id):
+    """Whether a ``role`` user scoped to ``hostel_id`` (None for all) may see ``event``."""
+    if hostel_id and event['hostel'] != str(hostel_id):
+        return False
+    statuses = ROLE_STATUSES.get(role)
+    return statuses is None or event['old_status'] in statuses or event['status'] in statuses
+
+
+@receiver(status_changed)
+def publish_status_changes(sender, changes, **kwargs):
+    events = events_for(changes)
+
+    def publish():
+        broker = get_broker()
+        for event in events:
+            broker.publish(event)
+
+    transaction.on_commit(publish)
@@ -0,0 +1,103 @@
+"""
+Read-only fast path for list responses.
+
+Instantiating model objects and resolving ``source='student.class_obj.name'``
+per row dominates the cost of serializing long outpass lists. FastListSerializer
+reads the field layout of a ModelSerializer once, fetches rows with a single
+``.values()`` query (plus one query per nested reverse relation such as
+``approvals``) and formats each value with the serializer's own field
+instances, so the JSON matches ``serializer_class(queryset, many=True).data``.
+"""
+from collections import defaultdict
+from functools import lru_cache
+
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+
+class FastListSerializer:
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        # In output order: (name, values() path, DRF field, guard paths) for plain
+        # fields or (name, None, child FastListSerializer, reverse FK attname) for
+        # nested many=True serializers.
+        self.fields = []
+        paths = {'pk'}
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(field.source)
+                self.fields.append((name, None, fast_serializer_for(type(field.child)), relation.field.attname))
+            elif isinstance(field, serializers.BaseSerializer):
+                raise TypeError(f'{serializer_class.__name__}.{name}: nested serializers need many=True')
+            else:
+                attrs = field.source_attrs
+                # DRF omits the key (SkipField) when an intermediate relation is NULL
+                guards = tuple('__'.join(attrs[:i]) for i in range(1, len(attrs)))
+                path = '__'.join(attrs)
+                self.fields.append((name, path, field, guards))
+                paths.update((path,) + guards)
+
+        self.paths = tuple(sorted(paths))
+
+    def values(self, queryset):
+        """``queryset`` as ``.values()`` dicts carrying every path the rows and their ordering need."""
+        ordering = {f.lstrip('-') for f in queryset.query.order_by if isinstance(f, str)}
+        return queryset.prefetch_related(None).values(*sorted(set(self.paths) | ordering))
+
+    def serialize(self, rows):
+        rows = list(rows)
+        children = {}
+        for name, path, child, remote_attname in self.fields:
+            if path is not None:
+                continue
+            grouped = children[name] = defaultdict(list)
+            if rows:
+                child_rows = child.model.objects.filter(
+                    **{f'{remote_attname}__in': [row['pk'] for row in rows]}
+                ).values(remote_attname, *child.paths)
+                for child_row in child_rows:
+                    grouped[child_row[remote_attname]].append(child_row)
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, path, field, extra in self.fields:
+                if path is None:
+                    item[name] = field.serialize(children[name][row['pk']])
+                    continue
+                if any(row[guard] is None for guard in extra):
+                    continue
+                value = row[path]
+                if value is None:
+                    item[name] = None
+                elif isinstance(field, PrimaryKeyRelatedField):
+                    item[name] = field.pk_field.to_representation(value) if field.pk_field else value
+                else:
+                    item[name] = field.to_representation(value)
+            data.append(item)
+        return data
+
+
+@lru_cache(maxsize=None)
+def fast_serializer_for(serializer_class):
+    return FastListSerializer(serializer_class)
+
+
+class FastListMixin:
+    """Serve a viewset's ``list`` action through FastListSerializer."""
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
+    def list_response(self, queryset):
+        fast = fast_serializer_for(self.get_serializer_class())
+        rows = fast.values(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(rows))
@@ -0,0 +1,603 @@
+"""
+Gate code resolution.
+
+A six-digit code typed or scanned at the gate is either the exit code of a
+READY_FOR_EXIT outpass (the student is leaving) or the return code of an
+outpass whose student is outside (returning). Both lookups are served by
+partial indexes covering only those statuses, so resolving a code stays
+O(1) however many completed outpasses accumulate.
+
+At the gate itself, scan() first looks the code up in an in-process table
+of live codes (ActiveCodeTable) and commits the transition with one
+conditional UPDATE, so a scan needs no read query. A signed pass (the QR
+code minted into Outpass.qr_code) carries its own GateCode, so scan_pass()
+needs neither the table nor the database to verify it.
+"""
+import copy
+import datetime
+import random
+import threading
+import uuid
+from collections import namedtuple
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import Case, CharField, IntegerField, Q, TextField, Value, When
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Outpass
+from .signals import StatusChange, status_changed
+
+EXIT = 'EXIT'
+ENTRY = 'ENTRY'
+
+# Statuses of a student who is outside and can scan back in
+OUTSIDE_STATUSES = [Outpass.Status.CHECKED_OUT, Outpass.Status.OVERDUE]
+
+# A live gate code: everything a scan needs to commit its transition and
+# report it through status_changed without reading the outpass first.
+GateCode = namedtuple('GateCode', [
+    'outpass_id', 'direction', 'status', 'student_name',
+    'hostel_id', 'class_id', 'section_id', 'outgoing_date', 'return_deadline',
+])
+
+
+def resolve_code(code):
+    """
+    ``(outpass, direction)`` for a gate code, with the student loaded, or
+    ``(None, None)``. An exit code wins if a code matches both ways.
+    """
+    match = (
+        Outpass.objects.select_related('student')
+        .filter(
+            Q(exit_code=code, status=Outpass.Status.READY_FOR_EXIT)
+            | Q(return_code=code, status__in=OUTSIDE_STATUSES)
+        )
+        .order_by(Case(
+            When(status=Outpass.Status.READY_FOR_EXIT, then=Value(0)),
+            default=Value(1), output_field=IntegerField(),
+        ))
+        .first()
+    )
+    if match is None:
+        return None, None
+    return match, EXIT if match.status == Outpass.Status.READY_FOR_EXIT else ENTRY
+
+
+def has_live_code(outpass):
+    """Whether ``outpass`` is in a status where one of its codes can be scanned."""
+    return bool(
+        (outpass.status == Outpass.Status.READY_FOR_EXIT and outpass.exit_code)
+        or (outpass.status in OUTSIDE_STATUSES and outpass.return_code)
+    )
+
+
+def gate_codes_for(outpass):
+    """``{code: GateCode}`` for the live code of ``outpass``, whose student must be loaded."""
+    if not has_live_code(outpass):
+        return {}
+    if outpass.status == Outpass.Status.READY_FOR_EXIT:
+        code, direction = outpass.exit_code, EXIT
+    else:
+        code, direction = outpass.return_code, ENTRY
+    student = outpass.student
+    return {code: GateCode(
+        outpass.pk, direction, outpass.status, student.first_name,
+        outpass.hostel_id, student.class_obj_id, student.section_id, outpass.outgoing_date, outpass.return_deadline,
+    )}
+
+
+def live_codes(**filters):
+    """Yield ``(code, GateCode)`` for every live code, read through the partial indexes."""
+    outpasses = Outpass.objects.select_related('student').filter(
+        Q(status=Outpass.Status.READY_FOR_EXIT) | Q(status__in=OUTSIDE_STATUSES), **filters
+    )
+    for outpass in outpasses.iterator():
+        yield from gate_codes_for(outpass).items()
+
+
+class ActiveCodeTable:
+    """
+    In-process map of live gate codes, loaded from the database on first use
+    and kept current by the receivers below.
+
+    It is only a hint. Every scan commits with a conditional UPDATE that
+    re-checks the code and status, and falls back to resolve_code() when the
+    entry is missing or stale. Another process may have moved the outpass,
+    so the table never has to be exact.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes = None
+        self._by_outpass = {}
+
+    def _load(self):
+        self._codes, self._by_outpass = {}, {}
+        for code, entry in live_codes():
+            self._put(code, entry)
+
+    def get(self, code):
+        with self._lock:
+            if self._codes is None:
+                self._load()
+            return self._codes.get(code)
+
+    def put(self, code, entry):
+        with self._lock:
+            # Before the first load the database is the source anyway
+            if self._codes is not None:
+                self._discard(entry.outpass_id)
+                self._put(code, entry)
+
+    def discard(self, outpass_ids):
+        with self._lock:
+            if self._codes is not None:
+                for outpass_id in outpass_ids:
+                    self._discard(outpass_id)
+
+    def reset(self):
+        with self._lock:
+            self._codes = None
+            self._by_outpass = {}
+
+    def _put(self, code, entry):
+        existing = self._codes.get(code)
+        # On a clash between live codes the exit code wins, as in resolve_code()
+        if existing is None or existing.direction == ENTRY:
+            self._codes[code] = entry
+            self._by_outpass[entry.outpass_id] = code
+
+    def _discard(self, outpass_id):
+        code = self._by_outpass.pop(outpass_id, None)
+        entry = self._codes.get(code)
+        if entry is not None and entry.outpass_id == outpass_id:
+            del self._codes[code]
+
+
+active_codes = ActiveCodeTable()
+
+
+def normalize_code(code):
+    """
+    A typed or scanned code as stored: codes are strings, but a client may
+    send them as JSON numbers or with stray whitespace. '' when there is no code.
+    """
+    return '' if code is None else str(code).strip()
+
+
+def scan(code, user, at=None):
+    """
+    Commit the gate transition for ``code``, recorded as happening ``at``
+    (default now). Returns ``(entry, return_code)`` where ``return_code`` is
+    the code issued on exit (empty on entry), or ``(None, None)`` when the
+    code is not live.
+    """
+    code = normalize_code(code)
+    entry = active_codes.get(code)
+    if entry is not None:
+        return_code = _commit(code, entry, user, at)
+        if return_code is not None:
+            return entry, return_code
+        # Stale entry: the outpass has moved on in this or another process
+
+    outpass, _ = resolve_code(code)
+    if outpass is None:
+        return None, None
+    entry = gate_codes_for(outpass).get(code)
+    if entry is None:
+        return None, None
+    return_code = _commit(code, entry, user, at)
+    if return_code is None:
+        # The same code was scanned concurrently
+        return None, None
+    return entry, return_code
+
+
+def _commit(code, entry, user, at=None):
+    """Conditional UPDATE for one scan; None when the outpass no longer matches ``entry``."""
+    now = timezone.now()
+    at = at or now
+    rows = Outpass.objects.filter(pk=entry.outpass_id, status=entry.status)
+    with transaction.atomic():
+        if entry.direction == EXIT:
+            return_code = str(random.randint(100000, 999999))
+            new_status = Outpass.Status.CHECKED_OUT
+            returning = entry._replace(direction=ENTRY, status=new_status)
+            updated = rows.filter(exit_code=code).update(
+                status=new_status, checkout_time=at, checked_out_by=user,
+                return_code=return_code, qr_code=mint_pass(return_code, returning, now), qr_generated_at=now,
+                updated_at=now,
+            )
+            on_time = None
+        else:
+            return_code = ''
+            new_status = Outpass.Status.COMPLETED
+            updated = rows.filter(return_code=code).update(status=new_status, actual_return_date=at, updated_at=now)
+            on_time = at <= entry.return_deadline
+        if not updated:
+            return None
+
+        # The UPDATE bypasses save(), so report the transition for counters and rollups
+        status_changed.send(sender=Outpass, changes=[StatusChange(
+            entry.outpass_id, entry.hostel_id, entry.outgoing_date, entry.status, new_status,
+            entry.class_id, entry.section_id, on_time,
+        )])
+        if return_code:
+            transaction.on_commit(lambda: active_codes.put(return_code, returning))
+    return return_code
+
+
+@receiver(status_changed)
+def discard_changed_codes(sender, changes, **kwargs):
+    outpass_ids = {change.outpass_id for change in changes}
+    transaction.on_commit(lambda: active_codes.discard(outpass_ids))
+
+
+@receiver(post_save, sender=Outpass)
+def add_issued_codes(sender, instance, **kwargs):
+    # Codes issued through save(); the transition engine calls refresh_codes itself
+    if has_live_code(instance):
+        refresh_codes([instance.pk])
+
+
+def refresh_codes(outpass_ids):
+    """Reload the live codes of ``outpass_ids`` into the table once the transaction commits."""
+    outpass_ids = list(outpass_ids)
+
+    def add():
+        for code, entry in live_codes(pk__in=outpass_ids):
+            active_codes.put(code, entry)
+
+    transaction.on_commit(add)
+
+
+MAX_BATCH_CODES = 200
+
+
+def resolve_codes(codes):
+    """``{code: GateCode}`` for every live code among ``codes``, in one query."""
+    outpasses = Outpass.objects.select_related('student').filter(
+        Q(exit_code__in=codes, status=Outpass.Status.READY_FOR_EXIT)
+        | Q(return_code__in=codes, status__in=OUTSIDE_STATUSES)
+    ).select_for_update(of=('self',))
+    found = {}
+    for outpass in outpasses:
+        for code, entry in gate_codes_for(outpass).items():
+            if code in codes and (code not in found or entry.direction == EXIT):
+                found[code] = entry
+    return found
+
+
+def scan_many(codes, user):
+    """
+    Commit the gate transitions for a burst of ``codes``: one query resolves
+    them and one UPDATE per direction applies them. Returns
+    ``{code: (entry, return_code)}`` for the codes that were applied.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        entries = resolve_codes(set(codes))
+        exits = {entry.outpass_id: code for code, entry in entries.items() if entry.direction == EXIT}
+        entries_in = {entry.outpass_id: code for code, entry in entries.items() if entry.direction == ENTRY}
+        return_codes = {outpass_id: str(random.randint(100000, 999999)) for outpass_id in exits}
+        return_passes = {
+            entry.outpass_id: mint_pass(
+                return_codes[entry.outpass_id], entry._replace(direction=ENTRY, status=Outpass.Status.CHECKED_OUT), now,
+            )
+            for entry in entries.values() if entry.direction == EXIT
+        }
+
+        applied = set()
+        if exits:
+            rows = Outpass.objects.filter(pk__in=exits, status=Outpass.Status.READY_FOR_EXIT)
+            updated = rows.update(
+                status=Outpass.Status.CHECKED_OUT, checkout_time=now, checked_out_by=user, updated_at=now,
+                return_code=Case(
+                    *(When(pk=outpass_id, then=Value(code)) for outpass_id, code in return_codes.items()),
+                    output_field=CharField(),
+                ),
+                qr_code=Case(
+                    *(When(pk=outpass_id, then=Value(token)) for outpass_id, token in return_passes.items()),
+                    output_field=TextField(),
+                ),
+                qr_generated_at=now,
+            )
+            applied |= _applied_ids(exits, updated, checkout_time=now, status=Outpass.Status.CHECKED_OUT)
+        if entries_in:
+            rows = Outpass.objects.filter(pk__in=entries_in, status__in=OUTSIDE_STATUSES)
+            updated = rows.update(status=Outpass.Status.COMPLETED, actual_return_date=now, updated_at=now)
+            applied |= _applied_ids(entries_in, updated, actual_return_date=now, status=Outpass.Status.COMPLETED)
+
+        results = {}
+        changes = []
+        for code, entry in entries.items():
+            if entry.outpass_id not in applied:
+                continue
+            if entry.direction == EXIT:
+                new_status, on_time = Outpass.Status.CHECKED_OUT, None
+                return_code = return_codes[entry.outpass_id]
+            else:
+                new_status, on_time = Outpass.Status.COMPLETED, now <= entry.return_deadline
+                return_code = ''
+            changes.append(StatusChange(
+                entry.outpass_id, entry.hostel_id, entry.outgoing_date, entry.status, new_status,
+                entry.class_id, entry.section_id, on_time,
+            ))
+            results[code] = (entry, return_code)
+
+        if changes:
+            status_changed.send(sender=Outpass, changes=changes)
+            returning = {
+                return_code: entry._replace(direction=ENTRY, status=Outpass.Status.CHECKED_OUT)
+                for entry, return_code in results.values() if return_code
+            }
+
+            def add_return_codes():
+                for code, entry in returning.items():
+                    active_codes.put(code, entry)
+
+            transaction.on_commit(add_return_codes)
+    return results
+
+
+def _applied_ids(outpass_ids, updated, **marks):
+    """
+    Which of ``outpass_ids`` a conditional bulk UPDATE changed. Normally all
+    of them; if a row moved on concurrently, re-read the rows carrying this
+    UPDATE's ``marks`` to tell which.
+    """
+    if updated == len(outpass_ids):
+        return set(outpass_ids)
+    return set(Outpass.objects.filter(pk__in=outpass_ids, **marks).values_list('pk', flat=True))
+
+
+# Offline gate mode
+#
+# A gate device downloads a signed snapshot of the live codes, validates scans
+# against it while offline and uploads them later with their device
+# timestamps. The signature lets the upload prove which codes the device was
+# told were valid, so a code that was live in the snapshot but has since been
+# used is reported as a conflict rather than as an invalid code.
+
+SNAPSHOT_SALT = 'outpasses.gate.snapshot'
+SNAPSHOT_MAX_AGE = datetime.timedelta(hours=24)
+# Device clocks may run a little ahead of the server
+CLOCK_SKEW = datetime.timedelta(minutes=5)
+MAX_OFFLINE_SCANS = 500
+
+APPLIED = 'applied'
+CONFLICT = 'conflict'
+INVALID = 'invalid'
+
+
+def build_snapshot(**filters):
+    """The live codes as device-facing dicts plus a signed token naming them."""
+    issued_at = timezone.now()
+    codes = [
+        {
+            'code': code,
+            'type': entry.direction,
+            'outpass': str(entry.outpass_id),
+            'student': entry.student_name,
+            'expected_return': entry.return_deadline.isoformat(),
+        }
+        for code, entry in live_codes(**filters)
+    ]
+    token = signing.dumps(
+        {'issued_at': issued_at.isoformat(), 'codes': sorted(item['code'] for item in codes)},
+        salt=SNAPSHOT_SALT, compress=True,
+    )
+    return {
+        'issued_at': issued_at,
+        'expires_at': issued_at + SNAPSHOT_MAX_AGE,
+        'codes': codes,
+        'token': token,
+    }
+
+
+def read_snapshot(token):
+    """The set of codes a snapshot token names; raises signing.BadSignature if forged or expired."""
+    payload = signing.loads(token, salt=SNAPSHOT_SALT, max_age=SNAPSHOT_MAX_AGE)
+    return set(payload['codes'])
+
+
+def apply_offline_scans(scans, user, snapshot_codes=None):
+    """
+    Apply offline ``scans`` (dicts with ``code``, ``scanned_at`` and an
+    optional client ``id``) in device-time order, in one transaction. Each
+    scan commits through its own savepoint (see _commit). Returns one result
+    dict per scan, in upload order.
+    """
+    now = timezone.now()
+    results = [None] * len(scans)
+    pending = []
+    for index, item in enumerate(scans):
+        result = {'id': item.get('id'), 'code': item.get('code')}
+        results[index] = result
+        scanned_at = item.get('scanned_at')
+        try:
+            at = parse_datetime(scanned_at) if isinstance(scanned_at, str) else None
+        except ValueError:
+            # Well formed but impossible, e.g. month 13
+            at = None
+        if at is not None and timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        if not isinstance(result['code'], str) or not result['code'] or at is None:
+            result.update(result=INVALID, error='code and a valid scanned_at are required')
+        elif at > now + CLOCK_SKEW:
+            result.update(result=INVALID, error='scanned_at is in the future')
+        else:
+            pending.append((min(at, now), index, result))
+
+    with transaction.atomic():
+        for at, _, result in sorted(pending, key=lambda item: (item[0], item[1])):
+            entry, return_code = scan(result['code'], user, at=at)
+            if entry is None:
+                known = snapshot_codes is not None and result['code'] in snapshot_codes
+                # Live when the device scanned it, but used or moved on since
+                result.update(result=CONFLICT if known else INVALID, error='Code is no longer valid' if known else 'Invalid Code')
+                continue
+            result.update(result=APPLIED, type=entry.direction, student=entry.student_name)
+            if return_code:
+                result['return_code'] = return_code
+    return results
+
+
+# Signed gate passes
+#
+# warden_vacate mints an exit pass into Outpass.qr_code and checkout replaces
+# it with the return pass. A pass carries the code, a validity window and the
+# GateCode fields, signed with SECRET_KEY (HMAC), so the gate verifies it with
+# no lookup and commits it through the same conditional UPDATE as a typed code.
+# Passes of cancelled or rejected outpasses are refused from an in-process
+# revocation set; the UPDATE's status check still catches anything revoked by
+# another process. An outpass that is approved again leaves the set: passes
+# minted before the revocation carry the old exit code, so the UPDATE refuses
+# them, while the pass minted at the next vacate is honoured.
+
+PASS_SALT = 'outpasses.gate.pass'
+# How long past the expected return a return pass is still honoured
+RETURN_GRACE = datetime.timedelta(days=2)
+REVOKED_STATUSES = [Outpass.Status.CANCELLED, Outpass.Status.REJECTED, Outpass.Status.EXPIRED]
+
+
+def _hex(value):
+    return value.hex if value else None
+
+
+def _uuid(value):
+    return uuid.UUID(value) if value else None
+
+
+def _timestamp(value):
+    return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+
+
+def mint_pass(code, entry, now=None):
+    """A signed pass for the live ``code`` described by ``entry``."""
+    now = now or timezone.now()
+    valid_until = entry.return_deadline if entry.direction == EXIT else entry.return_deadline + RETURN_GRACE
+    # A positional list keeps the token short enough for a dense QR code
+    payload = [
+        entry.outpass_id.hex, entry.direction, code, int(now.timestamp()), int(valid_until.timestamp()),
+        entry.student_name, _hex(entry.hostel_id), _hex(entry.class_id), _hex(entry.section_id),
+        entry.outgoing_date.isoformat(), int(entry.return_deadline.timestamp()),
+    ]
+    return signing.dumps(payload, salt=PASS_SALT, compress=True)
+
+
+def pass_for(outpass, now=None):
+    """A signed pass for the live code of ``outpass`` (student loaded), or ''."""
+    for code, entry in gate_codes_for(outpass).items():
+        return mint_pass(code, entry, now)
+    return ''
+
+
+def exit_pass(outpass, exit_code, now=None):
+    """The signed pass ``outpass`` (student loaded) will carry once READY_FOR_EXIT with ``exit_code``."""
+    ready = copy.copy(outpass)
+    ready.status, ready.exit_code = Outpass.Status.READY_FOR_EXIT, exit_code
+    return pass_for(ready, now)
+
+
+def read_pass(token):
+    """
+    ``(code, entry, valid_from, valid_until)`` for a pass; raises
+    signing.BadSignature if it was not minted here.
+    """
+    (outpass_id, direction, code, valid_from, valid_until, student_name,
+     hostel_id, class_id, section_id, outgoing_date, return_deadline) = signing.loads(token, salt=PASS_SALT)
+    entry = GateCode(
+        uuid.UUID(outpass_id), direction,
+        Outpass.Status.READY_FOR_EXIT if direction == EXIT else Outpass.Status.CHECKED_OUT,
+        student_name, _uuid(hostel_id), _uuid(class_id), _uuid(section_id),
+        datetime.date.fromisoformat(outgoing_date), _timestamp(return_deadline),
+    )
+    return code, entry, _timestamp(valid_from), _timestamp(valid_until)
+
+
+class RevokedPasses:
+    """
+    Outpass ids whose passes may still be inside their validity window but
+    were cancelled, rejected or expired, and have not been approved again
+    since. Loaded on first use, then kept current by revoke_passes below.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None
+
+    def _load(self):
+        # Older passes have expired on their own
+        cutoff = timezone.now() - RETURN_GRACE
+        self._ids = set(
+            Outpass.objects.filter(status__in=REVOKED_STATUSES, return_deadline__gte=cutoff)
+            .exclude(qr_code='').values_list('pk', flat=True)
+        )
+
+    def __contains__(self, outpass_id):
+        with self._lock:
+            if self._ids is None:
+                self._load()
+            return outpass_id in self._ids
+
+    def update(self, revoked, restored):
+        with self._lock:
+            if self._ids is not None:
+                self._ids = (self._ids | revoked) - restored
+
+    def reset(self):
+        with self._lock:
+            self._ids = None
+
+
+revoked_passes = RevokedPasses()
+
+
+@receiver(status_changed)
+def revoke_passes(sender, changes, **kwargs):
+    revoked = {change.outpass_id for change in changes if change.new_status in REVOKED_STATUSES}
+    restored = {
+        change.outpass_id for change in changes
+        if change.old_status in REVOKED_STATUSES and change.new_status not in REVOKED_STATUSES
+    }
+    if revoked or restored:
+        transaction.on_commit(lambda: revoked_passes.update(revoked, restored))
+
+
+def scan_pass(token, user):
+    """
+    Commit the gate transition for a signed pass. Returns ``(entry,
+    return_code)`` like scan(), ``(None, None)`` when the pass was revoked or
+    already used, and raises ValueError when it is forged or outside its
+    validity window.
+    """
+    try:
+        code, entry, valid_from, valid_until = read_pass(token)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ValueError('Invalid pass')
+    now = timezone.now()
+    if now < valid_from - CLOCK_SKEW:
+        raise ValueError('Pass is not valid yet')
+    if now > valid_until:
+        raise ValueError('Pass has expired')
+    if entry.outpass_id in revoked_passes:
+        return None, None
+
+    return_code = _commit(code, entry, user)
+    if return_code is not None:
+        return entry, return_code
+
+    # The outpass moved on since minting, e.g. to OVERDUE while outside
+    outpass = Outpass.objects.select_related('student').filter(pk=entry.outpass_id).first()
+    current = gate_codes_for(outpass).get(code) if outpass is not None else None
+    if current is None or current.direction != entry.direction:
+        return None, None
+    return_code = _commit(code, current, user)
+    if return_code is None:
+        return None, None
+    return current, return_code
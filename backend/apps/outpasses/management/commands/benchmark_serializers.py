@@ -0,0 +1,91 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from apps.academic.models import Class, Section
+from apps.housing.models import Hostel, Room
+from apps.outpasses.fastpath import fast_serializer_for
+from apps.outpasses.models import Outpass, Approval
+from apps.outpasses.serializers import DashboardOutpassSerializer, OutpassSerializer
+from apps.students.models import Student
+from apps.users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compares list serialization throughput of the DRF serializers and the .values() fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Outpasses to serialize')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per serializer; the best is reported')
+
+    def handle(self, *args, **options):
+        # Seed inside a transaction that is always rolled back
+        try:
+            with transaction.atomic():
+                self.seed(options['rows'])
+                self.run(options['rows'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def seed(self, rows):
+        hostel = Hostel.objects.create(name='Bench Hostel', type=Hostel.Types.BOYS)
+        room = Room.objects.create(hostel=hostel, room_number='B-1', floor=1)
+        class_obj = Class.objects.create(name='Bench Class', code='BENCH-SERIALIZERS')
+        section = Section.objects.create(class_obj=class_obj, name='Z')
+        parent = User.objects.create_user(phone='0000000001', role=User.Roles.PARENT, first_name='Bench')
+        approver = User.objects.create_user(phone='0000000002', role=User.Roles.HM, first_name='Bench HM')
+        today = timezone.localdate()
+
+        students = Student.objects.bulk_create([
+            Student(
+                student_id=f'BENCH{i}', first_name=f'Student {i}', last_name='Bench',
+                date_of_birth=datetime.date(2010, 1, 1), gender='M', roll_number=str(i),
+                class_obj=class_obj, section=section, hostel=hostel, room=room,
+                admission_date=today,
+            )
+            for i in range(rows)
+        ])
+        outpasses = Outpass.objects.bulk_create([
+            Outpass(
+                student=student, hostel=hostel, parent=parent, reason='Benchmark',
+                outgoing_date=today, outgoing_time=datetime.time(9),
+                expected_return_date=today, expected_return_time=datetime.time(18),
+                status=Outpass.Status.APPROVED,
+            )
+            for student in students
+        ])
+        Approval.objects.bulk_create([
+            Approval(outpass=outpass, approver=approver, approver_role=User.Roles.HM, status=Approval.Status.APPROVED)
+            for outpass in outpasses
+        ])
+
+    def run(self, rows, repeat):
+        queryset = Outpass.objects.filter(reason='Benchmark').select_related(
+            'student__class_obj', 'student__section', 'student__hostel', 'student__room', 'parent'
+        ).prefetch_related('approvals__approver').order_by('-created_at')
+
+        for serializer_class in (DashboardOutpassSerializer, OutpassSerializer):
+            fast = fast_serializer_for(serializer_class)
+            drf_seconds = self.best_of(repeat, lambda: serializer_class(queryset.all(), many=True).data)
+            fast_seconds = self.best_of(repeat, lambda: fast.serialize(fast.values(queryset.all())))
+            self.stdout.write(
+                f'{serializer_class.__name__}: '
+                f'DRF {rows / drf_seconds:,.0f} rows/s, '
+                f'fast path {rows / fast_seconds:,.0f} rows/s '
+                f'({drf_seconds / fast_seconds:.1f}x)'
+            )
+
+    def best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,227 @@
+import contextlib
+import datetime
+import http.client
+import json
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.housing.models import Hostel
+from apps.outpasses.gate import active_codes, live_codes
+from apps.outpasses.models import Outpass, local_datetime
+from apps.outpasses.signals import StatusChange, status_changed
+from apps.students.models import Student
+from apps.users.models import User
+from apps.users.scope import tokens_for
+
+SCAN_PATH = '/api/staff/dashboard/gate/process-code/'
+# Seeded rows are tagged with these so a later run can clean up after an aborted one
+REASON = 'Gate load test'
+STUDENT_PREFIX = 'LOADGATE'
+HOSTEL_PREFIX = 'Load Test Hostel'
+PHONE_PREFIX = '0099'
+# Scans measured in-process for the queries-per-scan figure
+SAMPLE_SCANS = 20
+# How long the server under test gets to start accepting connections
+SERVER_START_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds READY_FOR_EXIT outpasses, starts a server (runserver --noreload) and drives '
+        'gate/process-code on it from concurrent simulated gates, reporting latency percentiles, '
+        'scans/s and queries per scan. The server is started after seeding so its active-code '
+        'table holds the seeded codes, and is stopped when the run ends'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=0, help='Port for the server under test (default: a free one)')
+        parser.add_argument('--hostels', type=int, default=4)
+        parser.add_argument('--students', type=int, default=250, help='Students (one pass each) per hostel')
+        parser.add_argument('--gates', type=int, default=8, help='Concurrent simulated gates')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for codes and scan order')
+        parser.add_argument('--keep', action='store_true', help='Leave the seeded data in place')
+
+    def handle(self, *args, **options):
+        if options['hostels'] < 1 or options['students'] < 1 or options['gates'] < 1:
+            raise CommandError('--hostels, --students and --gates must be positive')
+        rng = random.Random(options['seed'])
+        self.cleanup()
+        try:
+            codes, gates = self.seed(options['hostels'], options['students'], options['gates'], rng)
+            rng.shuffle(codes)
+            sample, codes = codes[:SAMPLE_SCANS], codes[SAMPLE_SCANS:]
+            queries = self.queries_per_scan(sample, gates[0])
+            # A server that loaded its code table before seeding would miss every seeded
+            # code and measure the resolve_code() fallback, so start one only now
+            with self.server(options['port']) as port:
+                latencies, errors, seconds = self.drive(port, codes, gates)
+            self.report(latencies, errors, seconds, queries, len(gates))
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    def seed(self, hostels, students, gates, rng):
+        today = timezone.localdate()
+        taken = {code for code, _ in live_codes()}
+        total = hostels * students
+        codes = [code for code in map(str, rng.sample(range(100000, 1000000), total + len(taken))) if code not in taken][:total]
+
+        with transaction.atomic():
+            parent = User.objects.create_user(phone=f'{PHONE_PREFIX}000000', role=User.Roles.PARENT, first_name='Load')
+            gate_users = [
+                User.objects.create_user(phone=f'{PHONE_PREFIX}{i + 1:06d}', role=User.Roles.GATE_STAFF, first_name=f'Gate {i}')
+                for i in range(gates)
+            ]
+            outpasses = []
+            for h in range(hostels):
+                hostel = Hostel.objects.create(name=f'{HOSTEL_PREFIX} {h}', type=Hostel.Types.BOYS)
+                batch = Student.objects.bulk_create([
+                    Student(
+                        student_id=f'{STUDENT_PREFIX}{h}-{i}', first_name=f'Load {h}-{i}', last_name='Test',
+                        date_of_birth=datetime.date(2010, 1, 1), gender='M', roll_number=str(i),
+                        hostel=hostel, admission_date=today,
+                    )
+                    for i in range(students)
+                ])
+                outpasses += [
+                    Outpass(
+                        student=student, hostel=hostel, parent=parent, reason=REASON,
+                        outgoing_date=today, outgoing_time=datetime.time(9),
+                        expected_return_date=today + datetime.timedelta(days=1), expected_return_time=datetime.time(18),
+                        status=Outpass.Status.READY_FOR_EXIT, exit_code=codes[len(outpasses) + i],
+                    )
+                    for i, student in enumerate(batch)
+                ]
+            # bulk_create skips save(); set the instants it would have
+            for outpass in outpasses:
+                outpass.departure_at = local_datetime(outpass, 'outgoing_date', 'outgoing_time')
+                outpass.return_deadline = local_datetime(outpass, 'expected_return_date', 'expected_return_time')
+            Outpass.objects.bulk_create(outpasses, batch_size=500)
+            # and report the new outpasses so counters stay right
+            status_changed.send(sender=Outpass, changes=[
+                StatusChange(outpass.pk, outpass.hostel_id, today, None, outpass.status) for outpass in outpasses
+            ])
+
+        self.stdout.write(f'Seeded {total} READY_FOR_EXIT outpasses in {hostels} hostels for {gates} gates')
+        return codes, gate_users
+
+    def queries_per_scan(self, codes, user):
+        """Queries per scan, measured in this process on ``codes``."""
+        client = APIClient()
+        client.force_authenticate(user=user)
+        active_codes.get('')  # load the code table, as on a warmed-up server
+        with CaptureQueriesContext(connection) as ctx:
+            statuses = [client.post(SCAN_PATH, {'code': code}, format='json').status_code for code in codes]
+        if any(status != 200 for status in statuses):
+            raise CommandError(f'In-process sample scans failed with statuses {sorted(set(statuses))}')
+        return len(ctx.captured_queries) / len(codes)
+
+    @contextlib.contextmanager
+    def server(self, port):
+        """Run the server under test on 127.0.0.1 for the duration of the block; yields its port."""
+        if not port:
+            with socket.socket() as probe:
+                probe.bind(('127.0.0.1', 0))
+                port = probe.getsockname()[1]
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'django', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+                cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=log,
+            )
+            try:
+                deadline = time.monotonic() + SERVER_START_TIMEOUT
+                while True:
+                    if process.poll() is not None:
+                        log.seek(0)
+                        raise CommandError(
+                            f'The server exited with status {process.returncode}:\n'
+                            + log.read().decode(errors='replace')[-2000:]
+                        )
+                    try:
+                        socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                        break
+                    except OSError:
+                        if time.monotonic() > deadline:
+                            raise CommandError(f'The server did not accept connections on port {port} '
+                                               f'within {SERVER_START_TIMEOUT}s')
+                        time.sleep(0.2)
+                self.stdout.write(f'Server started on port {port}')
+                yield port
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+
+    def drive(self, port, codes, gates):
+        tokens = [str(tokens_for(user).access_token) for user in gates]
+        latencies, errors = [], []
+        lock = threading.Lock()
+        # Each gate scans its own share of the codes, back to back
+        shares = [codes[i::len(gates)] for i in range(len(gates))]
+        start_line = threading.Barrier(len(gates))
+
+        def run_gate(token, share):
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+            own_latencies, own_errors = [], []
+            start_line.wait()
+            for code in share:
+                started = time.perf_counter()
+                try:
+                    conn.request('POST', SCAN_PATH, json.dumps({'code': code}), headers)
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException) as exc:
+                    own_errors.append(type(exc).__name__)
+                    conn.close()
+                    continue
+                own_latencies.append(time.perf_counter() - started)
+                if response.status != 200:
+                    own_errors.append(str(response.status))
+            conn.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.extend(own_errors)
+
+        threads = [threading.Thread(target=run_gate, args=args) for args in zip(tokens, shares)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors, time.perf_counter() - started
+
+    def report(self, latencies, errors, seconds, queries, gates):
+        if len(latencies) < 2:
+            raise CommandError(f'Too few successful requests to report ({len(errors)} errors)')
+        cuts = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{len(latencies)} scans from {gates} gates in {seconds:.2f}s: {len(latencies) / seconds:,.0f} scans/s\n'
+            f'latency p50 {cuts[49] * 1000:.1f}ms, p95 {cuts[94] * 1000:.1f}ms, p99 {cuts[98] * 1000:.1f}ms\n'
+            f'{queries:.1f} DB queries per scan (measured in-process on {SAMPLE_SCANS} scans)'
+        )
+        if errors:
+            counts = {error: errors.count(error) for error in set(errors)}
+            self.stdout.write(self.style.WARNING(f'{len(errors)} failed scans: {counts}'))
+
+    def cleanup(self):
+        # Deleting through the ORM sends post_delete, which takes the outpasses back out of the counters
+        Outpass.objects.filter(reason=REASON, student__student_id__startswith=STUDENT_PREFIX).delete()
+        Student.objects.filter(student_id__startswith=STUDENT_PREFIX).delete()
+        Hostel.objects.filter(name__startswith=HOSTEL_PREFIX).delete()
+        User.objects.filter(phone__startswith=PHONE_PREFIX).delete()
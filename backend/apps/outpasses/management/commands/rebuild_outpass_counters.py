@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.outpasses.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-hostel outpass status counters from the Outpass table'
+
+    def handle(self, *args, **options):
+        rows = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} outpass status counter rows.'))
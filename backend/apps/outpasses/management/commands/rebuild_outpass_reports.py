@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from apps.outpasses.reports import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the daily/weekly/monthly outpass report rollups from the Outpass table. '
+        'For manual repair only: run it while no other process is writing outpasses, '
+        'as it replaces every rollup row (migration 0009 does the initial backfill)'
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} outpass report rollup rows.'))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.outpasses.sweeper import sweep
+
+
+class Command(BaseCommand):
+    help = 'Marks CHECKED_OUT outpasses past their expected return OVERDUE and unused approved ones EXPIRED'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0, help='Keep sweeping every N seconds instead of once')
+
+    def handle(self, *args, **options):
+        while True:
+            swept = sweep()
+            self.stdout.write(f"{swept['mark_overdue']} marked overdue, {swept['expire']} expired")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outpasses', '0005_outpass_exit_code_outpass_return_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['created_at', 'id'], name='outpasses_o_created_4fc781_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['updated_at', 'id'], name='outpasses_o_updated_a31a2c_idx'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE outpasses_outpass_fts USING fts5("
+    "document, content='outpasses_outpasssearchdocument', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER outpasses_search_ai AFTER INSERT ON outpasses_outpasssearchdocument BEGIN "
+    "INSERT INTO outpasses_outpass_fts(rowid, document) VALUES (new.id, new.document); END",
+    "CREATE TRIGGER outpasses_search_ad AFTER DELETE ON outpasses_outpasssearchdocument BEGIN "
+    "INSERT INTO outpasses_outpass_fts(outpasses_outpass_fts, rowid, document) VALUES ('delete', old.id, old.document); END",
+    "CREATE TRIGGER outpasses_search_au AFTER UPDATE ON outpasses_outpasssearchdocument BEGIN "
+    "INSERT INTO outpasses_outpass_fts(outpasses_outpass_fts, rowid, document) VALUES ('delete', old.id, old.document); "
+    "INSERT INTO outpasses_outpass_fts(rowid, document) VALUES (new.id, new.document); END",
+]
+
+FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS outpasses_search_au",
+    "DROP TRIGGER IF EXISTS outpasses_search_ad",
+    "DROP TRIGGER IF EXISTS outpasses_search_ai",
+    "DROP TABLE IF EXISTS outpasses_outpass_fts",
+]
+
+PG_SQL = [
+    "CREATE INDEX outpasses_search_tsv_idx ON outpasses_outpasssearchdocument "
+    "USING gin (to_tsvector('simple', document))",
+]
+
+PG_DROP_SQL = [
+    "DROP INDEX IF EXISTS outpasses_search_tsv_idx",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, FTS_SQL)
+    elif vendor == 'postgresql':
+        _run(schema_editor, PG_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, FTS_DROP_SQL)
+    elif vendor == 'postgresql':
+        _run(schema_editor, PG_DROP_SQL)
+
+
+def backfill_documents(apps, schema_editor):
+    Outpass = apps.get_model('outpasses', 'Outpass')
+    OutpassSearchDocument = apps.get_model('outpasses', 'OutpassSearchDocument')
+    rows = Outpass.objects.values_list(
+        'id', 'student__first_name', 'student__last_name', 'student__roll_number',
+        'student__class_obj__name', 'student__section__name', 'student__hostel__name',
+    )
+    OutpassSearchDocument.objects.bulk_create(
+        [
+            OutpassSearchDocument(outpass_id=row[0], document=' '.join(str(v) for v in row[1:] if v))
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outpasses', '0006_outpass_pagination_indexes'),
+        ('academic', '0002_initial'),
+        ('housing', '0003_remove_hostel_address_remove_hostel_capacity_and_more'),
+        ('students', '0003_student_unique_class_section_roll_no'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutpassSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document', models.TextField()),
+                ('outpass', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='outpasses.outpass')),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_counters(apps, schema_editor):
+    Outpass = apps.get_model('outpasses', 'Outpass')
+    OutpassStatusCounter = apps.get_model('outpasses', 'OutpassStatusCounter')
+    rows = (
+        Outpass.objects.order_by()
+        .values('student__hostel', 'status', 'outgoing_date')
+        .annotate(total=models.Count('id'))
+    )
+    OutpassStatusCounter.objects.bulk_create(
+        [
+            OutpassStatusCounter(
+                hostel_id=row['student__hostel'], status=row['status'],
+                date=row['outgoing_date'], count=row['total'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0003_remove_hostel_address_remove_hostel_capacity_and_more'),
+        ('outpasses', '0007_outpasssearchdocument'),
+        ('students', '0003_student_unique_class_section_roll_no'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutpassStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('FEE_PENDING', 'Fee Pending'), ('APPROVED', 'Approved'), ('READY_FOR_EXIT', 'Ready for Exit'), ('REJECTED', 'Rejected'), ('CANCELLED', 'Cancelled'), ('MEETING', 'Meeting'), ('CHECKED_OUT', 'Checked Out'), ('COMPLETED', 'Completed (Returned)'), ('EXPIRED', 'Expired'), ('OVERDUE', 'Overdue')], max_length=50)),
+                ('date', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('hostel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='outpass_counters', to='housing.hostel')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='outpassstatuscounter',
+            constraint=models.UniqueConstraint(fields=('hostel', 'status', 'date'), name='unique_outpass_status_counter'),
+        ),
+        migrations.AddConstraint(
+            model_name='outpassstatuscounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('hostel__isnull', True)), fields=('status', 'date'), name='unique_outpass_status_counter_no_hostel'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
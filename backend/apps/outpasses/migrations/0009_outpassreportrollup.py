@@ -0,0 +1,92 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:02
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+# Frozen copy of apps.outpasses.reports as of this migration, so later
+# changes to the live helpers don't change what it backfills
+PERIODS = ('DAILY', 'WEEKLY', 'MONTHLY')
+APPROVED_STATUSES = {'APPROVED', 'READY_FOR_EXIT', 'CHECKED_OUT', 'OVERDUE', 'COMPLETED'}
+
+
+def _period_start(period, date):
+    if period == 'WEEKLY':
+        return date - datetime.timedelta(days=date.weekday())
+    if period == 'MONTHLY':
+        return date.replace(day=1)
+    return date
+
+
+def _metrics(status, on_time):
+    metrics = ['total']
+    if status in APPROVED_STATUSES:
+        metrics.append('approved')
+    if status == 'REJECTED':
+        metrics.append('rejected')
+    if status == 'COMPLETED':
+        metrics.append('returned_on_time' if on_time else 'returned_late')
+    return metrics
+
+
+def backfill_rollups(apps, schema_editor):
+    Outpass = apps.get_model('outpasses', 'Outpass')
+    OutpassReportRollup = apps.get_model('outpasses', 'OutpassReportRollup')
+    rows = Outpass.objects.order_by().values_list(
+        'status', 'outgoing_date', 'student__hostel', 'student__class_obj', 'student__section',
+        'expected_return_date', 'expected_return_time', 'actual_return_date',
+    )
+    rollups = {}
+    for (status, outgoing_date, hostel_id, class_id, section_id,
+         return_date, return_time, actual) in rows.iterator():
+        on_time = actual is not None and actual <= timezone.make_aware(
+            datetime.datetime.combine(return_date, return_time)
+        )
+        for period in PERIODS:
+            start = _period_start(period, outgoing_date)
+            key = f'{period}:{start.isoformat()}:{hostel_id or "-"}:{class_id or "-"}:{section_id or "-"}'
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = OutpassReportRollup(
+                    key=key, period=period, period_start=start,
+                    hostel_id=hostel_id, class_obj_id=class_id, section_id=section_id,
+                )
+            for metric in _metrics(status, on_time):
+                setattr(rollup, metric, getattr(rollup, metric) + 1)
+    OutpassReportRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0003_remove_hostel_address_remove_hostel_capacity_and_more'),
+        ('academic', '0002_initial'),
+        ('outpasses', '0008_outpassstatuscounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutpassReportRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=160, unique=True)),
+                ('period', models.CharField(choices=[('DAILY', 'Daily'), ('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('total', models.IntegerField(default=0)),
+                ('approved', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('returned_on_time', models.IntegerField(default=0)),
+                ('returned_late', models.IntegerField(default=0)),
+                ('class_obj', models.ForeignKey(blank=True, db_column='class_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='academic.class')),
+                ('hostel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='housing.hostel')),
+                ('section', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='academic.section')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start'], name='outpasses_o_period_dbe5ee_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
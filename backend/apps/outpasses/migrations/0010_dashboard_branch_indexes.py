@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outpasses', '0009_outpassreportrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['status', 'updated_at'], name='outpass_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['status', 'outgoing_date'], name='outpass_status_outgoing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['status', 'actual_return_date'], name='outpass_status_returned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'FEE_PENDING'])), fields=['outgoing_date'], name='outpass_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('status', 'MEETING')), fields=['meeting_date'], name='outpass_meeting_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('status__in', ['READY_FOR_EXIT', 'CHECKED_OUT'])), fields=['updated_at'], name='outpass_at_gate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('status__in', ['CHECKED_OUT', 'OVERDUE'])), fields=['expected_return_date'], name='outpass_outside_return_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('status__in', ['CHECKED_OUT', 'OVERDUE'])), fields=['checkout_time'], name='outpass_outside_checkout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('is_priority', True)), fields=['created_at'], name='outpass_priority_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_hostel(apps, schema_editor):
+    Outpass = apps.get_model('outpasses', 'Outpass')
+    Student = apps.get_model('students', 'Student')
+    Outpass.objects.update(
+        hostel_id=models.Subquery(Student.objects.filter(pk=models.OuterRef('student_id')).values('hostel_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0003_remove_hostel_address_remove_hostel_capacity_and_more'),
+        ('outpasses', '0010_dashboard_branch_indexes'),
+        ('students', '0003_student_unique_class_section_roll_no'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outpass',
+            name='hostel',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outpasses', to='housing.hostel'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['hostel', 'status', 'outgoing_date'], name='outpass_hostel_outgoing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['hostel', 'status', 'updated_at'], name='outpass_hostel_updated_idx'),
+        ),
+        migrations.RunPython(backfill_hostel, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outpasses', '0011_outpass_hostel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('status', 'READY_FOR_EXIT')), fields=['exit_code'], name='outpass_exit_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('status__in', ['CHECKED_OUT', 'OVERDUE'])), fields=['return_code'], name='outpass_return_code_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outpasses', '0012_gate_code_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('status', 'CHECKED_OUT')), fields=['status', 'expected_return_date', 'expected_return_time'], name='outpass_overdue_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(condition=models.Q(('status__in', ['APPROVED', 'READY_FOR_EXIT'])), fields=['status', 'expected_return_date', 'expected_return_time'], name='outpass_unused_due_idx'),
+        ),
+    ]
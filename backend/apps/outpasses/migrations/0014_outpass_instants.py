@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:40
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_instants(apps, schema_editor):
+    # The dates and times are local; the zone is a setting, so combine in Python
+    Outpass = apps.get_model('outpasses', 'Outpass')
+    batch = []
+    for outpass in Outpass.objects.only(
+        'outgoing_date', 'outgoing_time', 'expected_return_date', 'expected_return_time',
+    ).iterator(chunk_size=500):
+        outpass.departure_at = timezone.make_aware(datetime.datetime.combine(outpass.outgoing_date, outpass.outgoing_time))
+        outpass.return_deadline = timezone.make_aware(
+            datetime.datetime.combine(outpass.expected_return_date, outpass.expected_return_time)
+        )
+        batch.append(outpass)
+        if len(batch) == 500:
+            Outpass.objects.bulk_update(batch, ['departure_at', 'return_deadline'])
+            batch = []
+    Outpass.objects.bulk_update(batch, ['departure_at', 'return_deadline'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outpasses', '0013_sweeper_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outpass',
+            name='outpass_overdue_due_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outpass',
+            name='outpass_unused_due_idx',
+        ),
+        migrations.AddField(
+            model_name='outpass',
+            name='departure_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='outpass',
+            name='return_deadline',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['status', 'return_deadline'], name='outpass_return_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['status', 'departure_at'], name='outpass_departure_at_idx'),
+        ),
+        migrations.RunPython(backfill_instants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0003_remove_hostel_address_remove_hostel_capacity_and_more'),
+        ('outpasses', '0014_outpass_instants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outpass',
+            name='hostel',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outpasses', to='housing.hostel'),
+        ),
+    ]
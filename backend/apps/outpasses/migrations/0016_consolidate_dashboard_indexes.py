@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outpasses', '0015_outpass_hostel_not_editable'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outpass',
+            name='outpasses_o_status_8c5129_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outpass',
+            name='outpasses_o_outgoin_f91624_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outpass',
+            name='outpass_pending_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outpass',
+            name='outpass_meeting_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outpass',
+            name='outpass_at_gate_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outpass',
+            name='outpass_outside_return_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outpass',
+            name='outpass_outside_checkout_idx',
+        ),
+        migrations.AddIndex(
+            model_name='outpass',
+            index=models.Index(fields=['status', 'meeting_date'], name='outpass_status_meeting_idx'),
+        ),
+    ]
@@ -1,5 +1,14 @@
 import uuid
+import datetime
 from django.db import models
+from django.utils import timezone
+
+def local_datetime(outpass, date_field, time_field):
+    """The aware instant of ``outpass``'s local date and time fields."""
+    date = outpass._meta.get_field(date_field).to_python(getattr(outpass, date_field))
+    time = outpass._meta.get_field(time_field).to_python(getattr(outpass, time_field))
+    return timezone.make_aware(datetime.datetime.combine(date, time))
+
 
 class Outpass(models.Model):
     class Status(models.TextChoices):
@@ -17,6 +26,13 @@ class Outpass(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='outpasses')
+    # Copy of student.hostel so warden views and counters filter one table.
+    # Set on save and kept in sync by apps.outpasses.signals; the composite
+    # indexes below lead with it, so it needs no index of its own.
+    hostel = models.ForeignKey(
+        'housing.Hostel', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='outpasses', db_index=False, editable=False,
+    )
     parent = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='requested_outpasses')
     guardian = models.ForeignKey('students.Guardian', on_delete=models.SET_NULL, null=True, blank=True, related_name='pickup_outpasses')
     
@@ -31,6 +47,9 @@ class Outpass(models.Model):
     expected_return_date = models.DateField()
     expected_return_time = models.TimeField()
     actual_return_date = models.DateTimeField(null=True, blank=True)
+    # outgoing_date/time and expected_return_date/time as one instant each, kept by save()
+    departure_at = models.DateTimeField(null=True, blank=True, editable=False)
+    return_deadline = models.DateTimeField(null=True, blank=True, editable=False)
     
     reason = models.TextField()
     destination = models.CharField(max_length=200, blank=True)
@@ -69,14 +88,90 @@ class Outpass(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        # Every transition rewrites status and updated_at, so each index here
+        # must earn its write cost: one per dashboard branch, and no more.
         indexes = [
-            models.Index(fields=['status', 'is_priority']),
-            models.Index(fields=['outgoing_date', 'expected_return_date']),
+            # Keyset pagination seeks for the history and polling lists
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
+            # StaffDashboardViewSet branches: the status filter leads so the
+            # ordering column is read in index order (pending and accountant,
+            # approved and gate, returned, meeting)
+            models.Index(fields=['status', 'outgoing_date'], name='outpass_status_outgoing_idx'),
+            models.Index(fields=['status', 'updated_at'], name='outpass_status_updated_idx'),
+            models.Index(fields=['status', 'actual_return_date'], name='outpass_status_returned_idx'),
+            models.Index(fields=['status', 'meeting_date'], name='outpass_status_meeting_idx'),
+            models.Index(
+                fields=['created_at'], name='outpass_priority_idx',
+                condition=models.Q(is_priority=True),
+            ),
+            # Gate code lookups (gate.py): only live codes are indexed
+            models.Index(
+                fields=['exit_code'], name='outpass_exit_code_idx',
+                condition=models.Q(status='READY_FOR_EXIT'),
+            ),
+            models.Index(
+                fields=['return_code'], name='outpass_return_code_idx',
+                condition=models.Q(status__in=['CHECKED_OUT', 'OVERDUE']),
+            ),
+            # Instant range scans: overdue as of now (sweeper.py, not_returned), departing soon
+            models.Index(fields=['status', 'return_deadline'], name='outpass_return_deadline_idx'),
+            models.Index(fields=['status', 'departure_at'], name='outpass_departure_at_idx'),
+            # Warden dashboards and the change feed, scoped to one hostel
+            models.Index(fields=['hostel', 'status', 'outgoing_date'], name='outpass_hostel_outgoing_idx'),
+            models.Index(fields=['hostel', 'status', 'updated_at'], name='outpass_hostel_updated_idx'),
         ]
 
     def __str__(self):
         return f"{self.student.first_name} - {self.status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so post_save receivers can tell what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or self.loaded_value('student_id') != self.student_id:
+            self.hostel_id = self.student.hostel_id
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = {*update_fields, 'hostel'}
+        if update_fields is None or {'outgoing_date', 'outgoing_time'} & set(update_fields):
+            self.departure_at = local_datetime(self, 'outgoing_date', 'outgoing_time')
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = {*update_fields, 'departure_at'}
+        if update_fields is None or {'expected_return_date', 'expected_return_time'} & set(update_fields):
+            self.return_deadline = local_datetime(self, 'expected_return_date', 'expected_return_time')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'return_deadline'}
+        super().save(*args, **kwargs)
+        self._loaded_values = {f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields}
+
+    def returned_on_time(self):
+        """Whether the student was back by the expected return date and time; None until returned."""
+        if not self.actual_return_date:
+            return None
+        return self.actual_return_date <= self.return_deadline
+
+    def loaded_value(self, attname):
+        """Value of ``attname`` as last loaded or saved, or None for a new instance."""
+        return getattr(self, '_loaded_values', {}).get(attname)
+
+
+class OutpassSearchDocument(models.Model):
+    """
+    Denormalised search text for an outpass: student name, roll number, class,
+    section and hostel. Kept in sync by apps.outpasses.signals and indexed by
+    FTS5 on SQLite or a tsvector GIN index on PostgreSQL (see search.py).
+    """
+    outpass = models.OneToOneField(Outpass, on_delete=models.CASCADE, related_name='search_document')
+    document = models.TextField()
+
+    def __str__(self):
+        return self.document
+
 
 class Approval(models.Model):
     class Status(models.TextChoices):
@@ -102,3 +197,63 @@ class Approval(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['outpass', 'approver_role'], name='unique_outpass_approval_role')
         ]
+
+
+class OutpassStatusCounter(models.Model):
+    """
+    Number of outpasses per (hostel, status, outgoing date). Maintained
+    incrementally by apps.outpasses.counters on every status change and
+    rebuilt from Outpass by the ``rebuild_outpass_counters`` command.
+    """
+    hostel = models.ForeignKey('housing.Hostel', on_delete=models.CASCADE, null=True, blank=True, related_name='outpass_counters')
+    status = models.CharField(max_length=50, choices=Outpass.Status.choices)
+    date = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hostel', 'status', 'date'], name='unique_outpass_status_counter'),
+            models.UniqueConstraint(
+                fields=['status', 'date'],
+                condition=models.Q(hostel__isnull=True),
+                name='unique_outpass_status_counter_no_hostel',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hostel_id} {self.status} {self.date}: {self.count}"
+
+
+class OutpassReportRollup(models.Model):
+    """
+    Precomputed report figures for one period bucket and one
+    (hostel, class, section) combination. Maintained incrementally by
+    apps.outpasses.reports, backfilled by migration 0009 and repairable with
+    ``rebuild_outpass_reports``.
+    """
+    class Periods(models.TextChoices):
+        DAILY = 'DAILY', 'Daily'
+        WEEKLY = 'WEEKLY', 'Weekly'
+        MONTHLY = 'MONTHLY', 'Monthly'
+
+    # period:period_start:hostel:class:section, unique even when dimensions are NULL
+    key = models.CharField(max_length=160, unique=True)
+    period = models.CharField(max_length=10, choices=Periods.choices)
+    period_start = models.DateField()
+    hostel = models.ForeignKey('housing.Hostel', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    class_obj = models.ForeignKey('academic.Class', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_column='class_id')
+    section = models.ForeignKey('academic.Section', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    total = models.IntegerField(default=0)
+    approved = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    returned_on_time = models.IntegerField(default=0)
+    returned_late = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['period', 'period_start']),
+        ]
+
+    def __str__(self):
+        return self.key
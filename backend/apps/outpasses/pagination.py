@@ -0,0 +1,49 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OutpassCursorPagination(CursorPagination):
+    """
+    Keyset pagination over whatever ordering the view's queryset already
+    applies, with the primary key appended as a stable tiebreaker. Each page
+    is a range seek on the leading ordering column instead of an OFFSET scan.
+
+    Pagination is opt-in so existing clients that expect a plain list keep
+    working: a response is only paginated when the request carries
+    ``cursor`` or ``page_size``.
+
+    A cursor position is a string, compared back against a model column. An
+    ordering led by an annotation (search's ``search_rank``) has no column to
+    compare against, so it is paged by offset instead.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-created_at'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+        if not ordering:
+            ordering = [self.ordering]
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            # Same direction as the leading key so the composite order is an index walk
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        columns = {name for field in queryset.model._meta.concrete_fields for name in (field.name, field.attname)}
+        self.keyed = ordering[0].lstrip('-') in columns | {'pk'}
+        return tuple(ordering)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if not self.keyed:
+            return None
+        field_name = ordering[0].lstrip('-')
+        if isinstance(instance, dict):
+            attr = instance[field_name]
+        else:
+            attr = getattr(instance, field_name)
+        # Nullable sort keys (e.g. checkout_time) fall back to offset paging
+        return None if attr is None else str(attr)
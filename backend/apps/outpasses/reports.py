@@ -0,0 +1,144 @@
+"""
+Outpass reporting rollups.
+
+OutpassReportRollup keeps, for every daily, weekly and monthly bucket of
+outgoing dates and every (hostel, class, section), how many outpasses there
+were and how many are approved, rejected and returned on time or late.
+StatusChange records from the ``status_changed`` signal move an outpass's
+contribution between metrics, so the HM reports read a few rollup rows
+instead of scanning Outpass.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .counters import increment
+from .models import Outpass, OutpassReportRollup
+
+Periods = OutpassReportRollup.Periods
+
+METRICS = ('total', 'approved', 'rejected', 'returned_on_time', 'returned_late')
+
+# Statuses an outpass only reaches after the HM approved it
+APPROVED_STATUSES = {
+    Outpass.Status.APPROVED,
+    Outpass.Status.READY_FOR_EXIT,
+    Outpass.Status.CHECKED_OUT,
+    Outpass.Status.OVERDUE,
+    Outpass.Status.COMPLETED,
+}
+
+
+def period_start(period, date):
+    if period == Periods.WEEKLY:
+        return date - datetime.timedelta(days=date.weekday())
+    if period == Periods.MONTHLY:
+        return date.replace(day=1)
+    return date
+
+
+def metrics_for(status, on_time):
+    """The metrics an outpass in ``status`` counts towards."""
+    metrics = ['total']
+    if status in APPROVED_STATUSES:
+        metrics.append('approved')
+    if status == Outpass.Status.REJECTED:
+        metrics.append('rejected')
+    if status == Outpass.Status.COMPLETED:
+        metrics.append('returned_on_time' if on_time else 'returned_late')
+    return metrics
+
+
+def bucket(period, date, hostel_id, class_id, section_id):
+    start = period_start(period, date)
+    key = f'{period}:{start.isoformat()}:{hostel_id or "-"}:{class_id or "-"}:{section_id or "-"}'
+    fields = {
+        'period': period,
+        'period_start': start,
+        'hostel_id': hostel_id,
+        'class_obj_id': class_id,
+        'section_id': section_id,
+    }
+    return key, fields
+
+
+def rollup_deltas(entries):
+    """
+    Fold ``(sign, status, outgoing_date, hostel_id, class_id, section_id, on_time)``
+    entries into ``{key: (bucket fields, {metric: delta})}`` for every period.
+    """
+    deltas = {}
+    for sign, status, date, hostel_id, class_id, section_id, on_time in entries:
+        for period in Periods.values:
+            key, fields = bucket(period, date, hostel_id, class_id, section_id)
+            metrics = deltas.setdefault(key, (fields, defaultdict(int)))[1]
+            for metric in metrics_for(status, on_time):
+                metrics[metric] += sign
+    return deltas
+
+
+def apply_changes(changes):
+    """Move each StatusChange's contribution from its old metrics to its new ones."""
+    entries = []
+    for change in changes:
+        dims = (change.outgoing_date, change.hostel_id, change.class_id, change.section_id, change.on_time)
+        if change.old_status:
+            entries.append((-1, change.old_status) + dims)
+        if change.new_status:
+            entries.append((1, change.new_status) + dims)
+
+    with transaction.atomic():
+        for key, (fields, metrics) in sorted(rollup_deltas(entries).items()):
+            metrics = {metric: delta for metric, delta in metrics.items() if delta}
+            if metrics:
+                increment(OutpassReportRollup, {'key': key}, metrics, defaults=fields)
+
+
+def rebuild_rollups(batch_size=1000):
+    """Recompute every rollup from Outpass. Returns the number of rollup rows."""
+    outpasses = Outpass.objects.order_by().select_related('student').only(
+        'status', 'outgoing_date', 'actual_return_date', 'return_deadline',
+        'hostel', 'student__class_obj', 'student__section',
+    )
+    entries = (
+        (
+            1, outpass.status, outpass.outgoing_date,
+            outpass.hostel_id, outpass.student.class_obj_id, outpass.student.section_id,
+            outpass.returned_on_time(),
+        )
+        for outpass in outpasses.iterator(chunk_size=batch_size)
+    )
+    rollups = [
+        OutpassReportRollup(key=key, **fields, **metrics)
+        for key, (fields, metrics) in rollup_deltas(entries).items()
+    ]
+    with transaction.atomic():
+        OutpassReportRollup.objects.all().delete()
+        OutpassReportRollup.objects.bulk_create(rollups, batch_size=batch_size)
+    return len(rollups)
+
+
+def build_report(period, start, end, **filters):
+    """
+    Report figures for outgoing dates in [start, end] bucketed by ``period``.
+    ``filters`` narrows the rollups, e.g. ``hostel_id=...``.
+    """
+    rollups = OutpassReportRollup.objects.filter(
+        period=period, period_start__range=(period_start(period, start), end), **filters
+    )
+    sums = {metric: Sum(metric) for metric in METRICS}
+
+    series = list(rollups.values('period_start').annotate(**sums).order_by('period_start'))
+    totals = {metric: sum(row[metric] for row in series) for metric in METRICS}
+    return {
+        'totals': totals,
+        'series': series,
+        'by_hostel': list(rollups.values(hostel_name=F('hostel__name')).annotate(**sums).order_by('hostel_name')),
+        'by_class': list(rollups.values(class_name=F('class_obj__name')).annotate(**sums).order_by('class_name')),
+        'by_section': list(
+            rollups.values(class_name=F('class_obj__name'), section_name=F('section__name'))
+            .annotate(**sums).order_by('class_name', 'section_name')
+        ),
+    }
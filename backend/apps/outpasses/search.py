@@ -0,0 +1,100 @@
+"""
+Indexed full-text search over outpasses.
+
+Each outpass has an OutpassSearchDocument holding the student's name, roll
+number, class, section and hostel as one string. On SQLite the documents are
+mirrored into an FTS5 table by triggers; on PostgreSQL they carry a GIN index
+on ``to_tsvector('simple', document)``. Both are created in migration 0007.
+Every search term is treated as a prefix, and results are ranked by
+relevance (bm25 / ts_rank).
+"""
+import re
+from itertools import islice
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import OutpassSearchDocument
+
+FTS_TABLE = 'outpasses_outpass_fts'
+
+# Values that make up an outpass's search document, in document order
+DOCUMENT_FIELDS = (
+    'student__first_name',
+    'student__last_name',
+    'student__roll_number',
+    'student__class_obj__name',
+    'student__section__name',
+    'student__hostel__name',
+)
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def build_document(values):
+    return ' '.join(str(value) for value in values if value)
+
+
+def refresh_search_documents(outpasses, batch_size=1000):
+    """Rebuild the search documents of every outpass in the ``outpasses`` queryset."""
+    rows = outpasses.order_by().values_list('id', *DOCUMENT_FIELDS).iterator(chunk_size=batch_size)
+    while True:
+        batch = [
+            OutpassSearchDocument(outpass_id=row[0], document=build_document(row[1:]))
+            for row in islice(rows, batch_size)
+        ]
+        if not batch:
+            break
+        OutpassSearchDocument.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['outpass'],
+            update_fields=['document'],
+        )
+
+
+def search_outpasses(queryset, term):
+    """
+    Filter ``queryset`` to outpasses matching every word of ``term`` as a
+    prefix and order them by relevance. The relevance is exposed as the
+    ``search_rank`` annotation (lower is better), so callers may re-order.
+    """
+    tokens = _TOKEN_RE.findall(term)
+    if not tokens:
+        return queryset.none()
+
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        matching_ids = RawSQL(
+            f'SELECT d.outpass_id FROM {FTS_TABLE} f '
+            f'JOIN outpasses_outpasssearchdocument d ON d.id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s',
+            (match,),
+        )
+        rank = RawSQL(
+            f'SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = ('
+            f'SELECT d.id FROM outpasses_outpasssearchdocument d '
+            f'WHERE d.outpass_id = "outpasses_outpass"."id")',
+            (match,),
+        )
+    elif vendor == 'postgresql':
+        match = ' & '.join(f'{token}:*' for token in tokens)
+        matching_ids = RawSQL(
+            "SELECT outpass_id FROM outpasses_outpasssearchdocument "
+            "WHERE to_tsvector('simple', document) @@ to_tsquery('simple', %s)",
+            (match,),
+        )
+        rank = RawSQL(
+            "SELECT -ts_rank(to_tsvector('simple', document), to_tsquery('simple', %s)) "
+            "FROM outpasses_outpasssearchdocument "
+            "WHERE outpass_id = \"outpasses_outpass\".\"id\"",
+            (match,),
+        )
+    else:
+        for token in tokens:
+            queryset = queryset.filter(search_document__document__icontains=token)
+        return queryset
+
+    return queryset.filter(id__in=matching_ids).annotate(search_rank=rank).order_by('search_rank')
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Outpass, Approval
+from .transitions import MAX_BULK_OUTPASSES
 
 from apps.students.models import Student
 
@@ -70,7 +71,7 @@ class DashboardOutpassSerializer(serializers.ModelSerializer):
     parent_name = serializers.CharField(source='parent.first_name', read_only=True)
     parent_phone = serializers.CharField(source='parent.phone', read_only=True)
     student_hostel = serializers.CharField(source='student.hostel.name', read_only=True)
-    student_room = serializers.CharField(source='student.room.number', read_only=True)
+    student_room = serializers.CharField(source='student.room.room_number', read_only=True)
     approvals = ApprovalSerializer(many=True, read_only=True)
     
     class Meta:
@@ -80,6 +81,13 @@ class DashboardOutpassSerializer(serializers.ModelSerializer):
 class FeePendingSerializer(serializers.Serializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2)
 
+class FeeItemSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+class BulkFeeSerializer(serializers.Serializer):
+    items = FeeItemSerializer(many=True, allow_empty=False, max_length=MAX_BULK_OUTPASSES)
+
 class MeetingSerializer(serializers.Serializer):
     date = serializers.DateTimeField() # Use ISO 8601 string
     venue = serializers.CharField(max_length=200)
@@ -0,0 +1,157 @@
+from collections import namedtuple
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.utils import timezone
+from django.dispatch import receiver, Signal
+from apps.academic.models import Class, Section
+from apps.housing.models import Hostel
+from apps.students.models import Student
+from .models import Outpass
+from . import counters, reports
+from .search import refresh_search_documents
+
+# One outpass moving between statuses. old_status is None for a new outpass
+# and new_status is None for a deleted one. on_time is the outpass's
+# returned_on_time() and only matters when either status is COMPLETED.
+StatusChange = namedtuple(
+    'StatusChange',
+    ['outpass_id', 'hostel_id', 'outgoing_date', 'old_status', 'new_status', 'class_id', 'section_id', 'on_time'],
+    defaults=(None, None, None),
+)
+
+# Sent with ``changes``, a list of StatusChange, whenever outpasses change
+# status, whether through Model.save() or a set-based UPDATE.
+status_changed = Signal()
+
+
+def _student_dims(outpass):
+    """(hostel_id, class_id, section_id) of the outpass; class and section come from its student."""
+    if Outpass.student.is_cached(outpass):
+        student = outpass.student
+        return outpass.hostel_id, student.class_obj_id, student.section_id
+    dims = Student.objects.filter(pk=outpass.student_id).values_list('class_obj_id', 'section_id').first()
+    return (outpass.hostel_id,) + (dims or (None, None))
+
+
+def _loaded_on_time(outpass):
+    """returned_on_time() as of the last load or save."""
+    actual, deadline = outpass.loaded_value('actual_return_date'), outpass.loaded_value('return_deadline')
+    if not actual or not deadline:
+        return None
+    return actual <= deadline
+
+
+@receiver(post_save, sender=Outpass)
+def outpass_saved(sender, instance, created, **kwargs):
+    old_status = None if created else instance.loaded_value('status')
+    old_date = None if created else instance.loaded_value('outgoing_date')
+    on_time = instance.returned_on_time()
+    # A COMPLETED outpass counts as on time or late, so a new deadline or return time moves it
+    old_on_time = _loaded_on_time(instance) if old_status == Outpass.Status.COMPLETED else on_time
+    # save() re-copies the hostel when the outpass moves to another student
+    moved_student = not created and instance.loaded_value('student_id') != instance.student_id
+    if (
+        old_status == instance.status and old_date == instance.outgoing_date
+        and old_on_time == on_time and not moved_student
+    ):
+        return
+
+    dims = _student_dims(instance)
+    if created or (old_date == instance.outgoing_date and old_on_time == on_time and not moved_student):
+        changes = [StatusChange(instance.pk, dims[0], instance.outgoing_date, old_status, instance.status, *dims[1:], on_time)]
+    else:
+        # Leave the old bucket and metrics, then join the new ones
+        old_dims = dims
+        if moved_student:
+            old_dims = (instance.loaded_value('hostel_id'),) + (
+                Student.objects.filter(pk=instance.loaded_value('student_id'))
+                .values_list('class_obj_id', 'section_id').first() or (None, None)
+            )
+        changes = [
+            StatusChange(instance.pk, old_dims[0], old_date, old_status, None, *old_dims[1:], old_on_time),
+            StatusChange(instance.pk, dims[0], instance.outgoing_date, None, instance.status, *dims[1:], on_time),
+        ]
+    status_changed.send(sender=Outpass, changes=changes)
+
+
+@receiver(post_delete, sender=Outpass)
+def outpass_deleted(sender, instance, **kwargs):
+    hostel_id, class_id, section_id = _student_dims(instance)
+    change = StatusChange(
+        instance.pk, hostel_id, instance.outgoing_date, instance.status, None,
+        class_id=class_id, section_id=section_id, on_time=instance.returned_on_time(),
+    )
+    status_changed.send(sender=Outpass, changes=[change])
+
+
+@receiver(pre_save, sender=Student)
+def remember_student_dims(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    instance._outpass_dims = Student.objects.filter(pk=instance.pk).values_list(
+        'hostel_id', 'class_obj_id', 'section_id'
+    ).first()
+
+
+@receiver(post_save, sender=Student)
+def move_student_outpasses(sender, instance, created, **kwargs):
+    """
+    Follow a student moving hostel, class or section: copy the new hostel
+    onto their outpasses and move the outpasses between counter and rollup
+    buckets.
+    """
+    old = getattr(instance, '_outpass_dims', None)
+    new = (instance.hostel_id, instance.class_obj_id, instance.section_id)
+    if created or old is None or old == new:
+        return
+
+    outpasses = list(Outpass.objects.filter(student=instance).only(
+        'status', 'outgoing_date', 'actual_return_date', 'return_deadline',
+    ))
+    if not outpasses:
+        return
+    if old[0] != new[0]:
+        Outpass.objects.filter(student=instance).update(hostel_id=new[0], updated_at=timezone.now())
+
+    changes = []
+    for outpass in outpasses:
+        on_time = outpass.returned_on_time()
+        changes.append(StatusChange(outpass.pk, old[0], outpass.outgoing_date, outpass.status, None, old[1], old[2], on_time))
+        changes.append(StatusChange(outpass.pk, new[0], outpass.outgoing_date, None, outpass.status, new[1], new[2], on_time))
+    status_changed.send(sender=Outpass, changes=changes)
+
+
+@receiver(status_changed)
+def update_status_counters(sender, changes, **kwargs):
+    counters.apply_changes(changes)
+
+
+@receiver(status_changed)
+def update_report_rollups(sender, changes, **kwargs):
+    reports.apply_changes(changes)
+
+
+@receiver(post_save, sender=Outpass)
+def refresh_outpass_search_document(sender, instance, created, **kwargs):
+    if created or instance.loaded_value('student_id') != instance.student_id:
+        refresh_search_documents(Outpass.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Student)
+def refresh_student_search_documents(sender, instance, created, **kwargs):
+    if not created:
+        refresh_search_documents(Outpass.objects.filter(student=instance))
+
+
+@receiver(post_save, sender=Class)
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=Hostel)
+def refresh_renamed_search_documents(sender, instance, created, **kwargs):
+    if created:
+        return
+    lookup = {
+        Class: 'student__class_obj',
+        Section: 'student__section',
+        Hostel: 'student__hostel',
+    }[sender]
+    refresh_search_documents(Outpass.objects.filter(**{lookup: instance}))
@@ -0,0 +1,82 @@
+"""
+Time-based status changes.
+
+Nothing happens at the gate when a student fails to come back or an approved
+pass goes unused, so sweep() moves those outpasses on: CHECKED_OUT outpasses
+past their expected return become OVERDUE, and APPROVED or READY_FOR_EXIT
+ones whose return time has passed unused become EXPIRED. Due outpasses are
+found through partial indexes and moved by the transition engine, one
+set-based UPDATE per batch, so counters and dashboards see the stored status
+instead of computing lateness per query.
+
+Run it from cron with ``manage.py sweep_outpasses``, keep that running with
+``--interval``, or set ``settings.OUTPASS_SWEEP_INTERVAL`` (seconds) on one
+server process to sweep on a daemon thread started by the ASGI/WSGI entry
+point. Every UPDATE re-checks the status, so overlapping sweeps are harmless,
+only wasteful.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import Outpass
+from .transitions import TRANSITIONS, apply_bulk
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH = 500
+# Transitions a sweep applies, in order
+SWEPT = ('mark_overdue', 'expire')
+
+
+def due(statuses, now):
+    """Outpasses in ``statuses`` whose expected return is before ``now``."""
+    # One range scan of outpass_return_deadline_idx per status
+    return Outpass.objects.filter(status__in=statuses, return_deadline__lt=now)
+
+
+def sweep(now=None):
+    """Apply the swept transitions to everything due at ``now``; returns ``{name: count}``."""
+    now = now or timezone.now()
+    swept = {}
+    for name in SWEPT:
+        rule = TRANSITIONS[name]
+        swept[name] = 0
+        while True:
+            ids = list(due(rule.sources, now).values_list('pk', flat=True)[:SWEEP_BATCH])
+            moved = apply_bulk(rule, Outpass.objects.filter(pk__in=ids), None) if ids else []
+            swept[name] += len(moved)
+            # A short batch was the last; an empty result means another sweep took them
+            if len(ids) < SWEEP_BATCH or not moved:
+                break
+    return swept
+
+
+def start_sweeper(interval):
+    """Run sweep() every ``interval`` seconds on a daemon thread."""
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                sweep()
+            except Exception:
+                logger.exception('Outpass sweep failed')
+            finally:
+                close_old_connections()
+
+    thread = threading.Thread(target=run, name='outpass-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+
+def start_configured_sweeper():
+    """start_sweeper() when settings.OUTPASS_SWEEP_INTERVAL is set; called by the server entry points only."""
+    interval = getattr(settings, 'OUTPASS_SWEEP_INTERVAL', None)
+    if interval:
+        return start_sweeper(interval)
+    return None
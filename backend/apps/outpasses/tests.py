@@ -1,14 +1,89 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import itertools
+import threading
+import uuid
+from unittest import mock, skipUnless
+
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from apps.outpasses.models import Outpass
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.academic.models import Class, Section
+from apps.housing.models import Hostel, Room
+from apps.outpasses.changes import encode_token
+from apps.outpasses.counters import rebuild_counters, status_totals
+from apps.outpasses.events import get_broker, visible_to
+from apps.outpasses.fastpath import fast_serializer_for
+from apps.outpasses.gate import active_codes, resolve_code, revoked_passes
+from apps.outpasses.models import Outpass, Approval, OutpassReportRollup, OutpassStatusCounter
+from apps.outpasses.reports import rebuild_rollups
+from apps.outpasses.serializers import DashboardOutpassSerializer, OutpassSerializer
+from apps.outpasses.sweeper import SWEPT, due, start_configured_sweeper, start_sweeper, sweep
+from apps.outpasses.transitions import TRANSITIONS, apply_bulk
+from apps.outpasses.views import StaffDashboardViewSet
+from apps.students.models import Student, StudentParentRelationship
 
 User = get_user_model()
 
+_seq = itertools.count(1)
+
+
+def make_user(role, **extra):
+    return User.objects.create_user(phone=f'9{next(_seq):09d}', password='password', role=role, **extra)
+
+
+def make_student(hostel=None, class_obj=None, section=None, room=None, parent=None):
+    n = next(_seq)
+    student = Student.objects.create(
+        student_id=f'S{n}',
+        admission_number=f'ADM{n}',
+        first_name=f'Student{n}',
+        last_name='Test',
+        date_of_birth=datetime.date(2010, 1, 1),
+        gender='M',
+        roll_number=str(n),
+        class_obj=class_obj,
+        section=section,
+        hostel=hostel,
+        room=room,
+        admission_date=datetime.date(2020, 6, 1),
+    )
+    if parent:
+        StudentParentRelationship.objects.create(student=student, parent=parent, relationship='FATHER')
+    return student
+
+
+def make_outpass(student, parent, status=Outpass.Status.PENDING, **extra):
+    today = timezone.now().date()
+    fields = {
+        'outgoing_date': today,
+        'outgoing_time': datetime.time(9, 0),
+        'expected_return_date': today + datetime.timedelta(days=2),
+        'expected_return_time': datetime.time(18, 0),
+        'reason': 'Family function',
+    }
+    fields.update(extra)
+    return Outpass.objects.create(student=student, parent=parent, status=status, **fields)
+
+
+def query_plan(queryset):
+    """SQLite's EXPLAIN QUERY PLAN for ``queryset``, as one string."""
+    with CaptureQueriesContext(connection) as ctx:
+        list(queryset.values_list('pk', flat=True))
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {ctx.captured_queries[0]['sql']}")
+        return ' '.join(row[-1] for row in cursor.fetchall())
+
+
 class DashboardStatsTest(TestCase):
     def setUp(self):
         self.client = APIClient()
-        self.user = User.objects.create_user(username='admin', password='password', role='ADMIN')
+        self.user = User.objects.create_user(phone='9000000000', password='password', role='ADMIN')
         self.client.force_authenticate(user=self.user)
 
     def test_stats_endpoint(self):
@@ -18,3 +93,1060 @@ class DashboardStatsTest(TestCase):
         self.assertIn('active_outpasses', response.data)
         self.assertIn('trends', response.data)
         print("Stats Endpoint Response Keys:", response.data.keys())
+
+
+class DashboardQueryBudgetTest(TestCase):
+    """Every list branch must cost the same number of queries for 1 row or many."""
+
+    # (role, query string, query budget); the budget includes the ETag aggregate
+    BRANCHES = [
+        ('HM', '', 3),
+        ('HM', '?history=true', 3),
+        ('HM', '?priority=true', 3),
+        ('HM', '?status=returned', 3),
+        ('HM', '?status=not_returned', 3),
+        ('HM', '?status=approved', 3),
+        ('HM', '?status=meeting', 3),
+        ('HM', '?status=pending', 3),
+        ('HM', '?search=Student', 3),
+        ('ACCOUNTANT', '', 3),
+        ('WARDEN', '', 4),
+        ('WARDEN', '?status=in_hostel', 4),
+        ('WARDEN', '?status=checked_out', 4),
+        ('WARDEN', '?status=outside', 4),
+        ('GATE_STAFF', '', 3),
+        ('ADMIN', '', 3),
+    ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.hostel = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        self.room = Room.objects.create(hostel=self.hostel, room_number='101', floor=1)
+        self.class_obj = Class.objects.create(name='10th', code='X')
+        self.section = Section.objects.create(class_obj=self.class_obj, name='A')
+        self.parent = make_user('PARENT')
+        self.approver = make_user('HM')
+        self.users = {role: make_user(role) for role in ('HM', 'ACCOUNTANT', 'WARDEN', 'GATE_STAFF', 'ADMIN')}
+        profile = self.users['WARDEN'].staff_profile
+        profile.assigned_hostel = self.hostel
+        profile.save()
+
+    def add_batch(self):
+        """One outpass in every status any branch lists, each with an approval."""
+        now = timezone.now()
+        batch = [
+            (Outpass.Status.PENDING, {'is_priority': True}),
+            (Outpass.Status.FEE_PENDING, {}),
+            (Outpass.Status.APPROVED, {}),
+            (Outpass.Status.READY_FOR_EXIT, {'exit_code': '123456'}),
+            (Outpass.Status.MEETING, {'meeting_date': now}),
+            (Outpass.Status.CHECKED_OUT, {'checkout_time': now}),
+            (Outpass.Status.OVERDUE, {'checkout_time': now}),
+            (Outpass.Status.COMPLETED, {'actual_return_date': now}),
+        ]
+        for status, extra in batch:
+            student = make_student(self.hostel, self.class_obj, self.section, self.room, self.parent)
+            outpass = make_outpass(student, self.parent, status, **extra)
+            Approval.objects.create(outpass=outpass, approver=self.approver, approver_role='HM', status=Approval.Status.APPROVED)
+
+    def count_queries(self, role, query):
+        # Fresh user instance so cached relations do not hide per-request queries
+        self.client.force_authenticate(user=User.objects.get(pk=self.users[role].pk))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/staff/dashboard/{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data, f'{role} {query} returned no rows')
+        return len(ctx.captured_queries)
+
+    def test_list_branches_cost_constant_queries(self):
+        self.add_batch()
+        small = {(role, query): self.count_queries(role, query) for role, query, _ in self.BRANCHES}
+        for _ in range(4):
+            self.add_batch()
+
+        for role, query, budget in self.BRANCHES:
+            with self.subTest(role=role, query=query):
+                large = self.count_queries(role, query)
+                self.assertEqual(small[(role, query)], large)
+                self.assertLessEqual(large, budget)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Reads SQLite EXPLAIN QUERY PLAN output')
+    def test_list_branches_use_indexes(self):
+        """No dashboard query may read Outpass with a full table scan."""
+        for _ in range(5):
+            self.add_batch()
+        for role, query, _ in self.BRANCHES:
+            self.client.force_authenticate(user=self.users[role])
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(f'/api/staff/dashboard/{query}')
+            for captured in ctx.captured_queries:
+                if 'outpasses_outpass' not in captured['sql']:
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {captured['sql']}")
+                    plan = [row[-1] for row in cursor.fetchall()]
+                scans = [step for step in plan if step == 'SCAN outpasses_outpass']
+                with self.subTest(role=role, query=query, plan=plan):
+                    self.assertEqual(scans, [])
+
+    def test_outpass_list_costs_constant_queries(self):
+        self.add_batch()
+        self.client.force_authenticate(user=self.parent)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/outpasses/')
+        for _ in range(4):
+            self.add_batch()
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/api/outpasses/')
+        self.assertEqual(len(response.data), 40)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=make_user('HM'))
+        parent = make_user('PARENT')
+        self.ids = set()
+        for _ in range(7):
+            student = make_student(parent=parent)
+            self.ids.add(str(make_outpass(student, parent).id))
+
+    def test_unpaginated_without_cursor_params(self):
+        response = self.client.get('/api/staff/dashboard/?history=true')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_pages_cover_every_row_once(self):
+        self.assertEqual(self.walk('/api/staff/dashboard/?history=true&page_size=3'), self.ids)
+
+    def test_ranked_search_pages_cover_every_row_once(self):
+        # Ordered by the search_rank annotation, which is not a column to seek on
+        for i, student in enumerate(Student.objects.filter(outpasses__isnull=False)):
+            student.first_name = ' '.join(['Test'] * (i % 3) + [f'Student{i}'] * i)
+            student.save()
+        self.assertEqual(self.walk('/api/staff/dashboard/?search=Test&page_size=3'), self.ids)
+
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 7)
+        return set(seen)
+
+
+class DashboardSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=make_user('HM'))
+        self.hostel = Hostel.objects.create(name='Nilgiri', type=Hostel.Types.BOYS)
+        class_obj = Class.objects.create(name='Ninth', code='IX')
+        section = Section.objects.create(class_obj=class_obj, name='B')
+        parent = make_user('PARENT')
+        self.student = make_student(self.hostel, class_obj, section, parent=parent)
+        self.student.first_name = 'Aravind'
+        self.student.roll_number = 'R-2041'
+        self.student.save()
+        self.outpass = make_outpass(self.student, parent)
+        make_outpass(make_student(parent=parent), parent)
+
+    def search(self, term):
+        response = self.client.get('/api/staff/dashboard/', {'search': term, 'history': 'true'})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_prefix_matches_each_document_field(self):
+        for term in ('arav', 'Aravind', 'R-2041', 'ninth', 'nilg', 'arav nin'):
+            with self.subTest(term=term):
+                self.assertEqual(self.search(term), [str(self.outpass.id)])
+
+    def test_ranked_results_without_explicit_ordering(self):
+        response = self.client.get('/api/staff/dashboard/', {'search': 'arav'})
+        self.assertEqual([row['id'] for row in response.data], [str(self.outpass.id)])
+
+    def test_no_match(self):
+        self.assertEqual(self.search('zzz'), [])
+        self.assertEqual(self.search('arav zzz'), [])
+
+    def test_document_follows_renames(self):
+        self.hostel.name = 'Vindhya'
+        self.hostel.save()
+        self.assertEqual(self.search('vindh'), [str(self.outpass.id)])
+        self.assertEqual(self.search('nilg'), [])
+
+
+class StatusCounterTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.north = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        self.south = Hostel.objects.create(name='South', type=Hostel.Types.GIRLS)
+        self.parent = make_user('PARENT')
+        self.warden = make_user('WARDEN')
+        self.warden.staff_profile.assigned_hostel = self.north
+        self.warden.staff_profile.save()
+
+    def counter_rows(self):
+        return sorted(
+            OutpassStatusCounter.objects.filter(count__gt=0).values_list('hostel_id', 'status', 'date', 'count'),
+            key=str,
+        )
+
+    def test_transitions_keep_counters_in_step_with_rebuild(self):
+        passes = [make_outpass(make_student(hostel), self.parent) for hostel in (self.north, self.north, self.south)]
+        passes[0].status = Outpass.Status.APPROVED
+        passes[0].save()
+        passes[1].status = Outpass.Status.CHECKED_OUT
+        passes[1].save()
+        passes[1].outgoing_date -= datetime.timedelta(days=1)
+        passes[1].save()
+        passes[2].delete()
+
+        incremental = self.counter_rows()
+        rebuild_counters()
+        self.assertEqual(incremental, self.counter_rows())
+
+    def test_stats_are_scoped_to_warden_hostel(self):
+        make_outpass(make_student(self.north), self.parent)
+        make_outpass(make_student(self.south), self.parent)
+        make_outpass(make_student(self.south), self.parent, Outpass.Status.CHECKED_OUT)
+
+        self.client.force_authenticate(user=make_user('HM'))
+        response = self.client.get('/api/staff/dashboard/stats/')
+        self.assertEqual((response.data['total'], response.data['pending'], response.data['active']), (3, 2, 1))
+
+        self.client.force_authenticate(user=self.warden)
+        response = self.client.get('/api/staff/dashboard/stats/')
+        self.assertEqual((response.data['total'], response.data['pending'], response.data['active']), (1, 1, 0))
+
+
+class StatsTrendTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=make_user('HM'))
+        self.hostel = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        parent = make_user('PARENT')
+        today = timezone.localdate()
+        for days_ago in (0, 0, 3, 20, 200):
+            make_outpass(make_student(self.hostel), parent, outgoing_date=today - datetime.timedelta(days=days_ago))
+        make_outpass(make_student(), parent, Outpass.Status.APPROVED)
+
+    def test_every_window_costs_one_query(self):
+        for days, window_total in ((7, 4), (30, 5), (90, 5)):
+            with self.subTest(days=days):
+                with self.assertNumQueries(1):
+                    response = self.client.get('/api/staff/dashboard/stats/', {'days': days})
+                self.assertEqual(len(response.data['trends']), days)
+                self.assertEqual(sum(point['count'] for point in response.data['trends']), window_total)
+                self.assertEqual(response.data['trends'][-1]['count'], 3)
+                self.assertEqual((response.data['total'], response.data['pending'], response.data['approved']), (6, 5, 1))
+
+    def test_hostel_filter(self):
+        response = self.client.get('/api/staff/dashboard/stats/', {'hostel': str(self.hostel.id)})
+        self.assertEqual((response.data['total'], response.data['approved']), (5, 0))
+
+    def test_rejects_unknown_window(self):
+        self.assertEqual(self.client.get('/api/staff/dashboard/stats/', {'days': 12}).status_code, 400)
+
+
+class ReportRollupTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=make_user('HM'))
+        self.hostel = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        self.class_obj = Class.objects.create(name='10th', code='X')
+        self.section = Section.objects.create(class_obj=self.class_obj, name='A')
+        parent = make_user('PARENT')
+        today = timezone.localdate()
+        self.passes = [
+            make_outpass(make_student(self.hostel, self.class_obj, self.section), parent, outgoing_date=today - datetime.timedelta(days=days))
+            for days in (0, 1, 2, 40)
+        ]
+
+    def complete(self, outpass, late):
+        deadline = timezone.make_aware(datetime.datetime.combine(outpass.expected_return_date, outpass.expected_return_time))
+        outpass.status = Outpass.Status.COMPLETED
+        outpass.actual_return_date = deadline + datetime.timedelta(hours=2 if late else -2)
+        outpass.save()
+
+    def rollup_rows(self):
+        fields = ('key', 'total', 'approved', 'rejected', 'returned_on_time', 'returned_late')
+        return sorted(OutpassReportRollup.objects.values_list(*fields))
+
+    def test_report_reflects_transitions(self):
+        self.passes[0].status = Outpass.Status.APPROVED
+        self.passes[0].save()
+        self.complete(self.passes[1], late=False)
+        self.complete(self.passes[2], late=True)
+        self.passes[3].status = Outpass.Status.REJECTED
+        self.passes[3].save()
+
+        response = self.client.get('/api/staff/dashboard/reports/', {'period': 'daily'})
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(
+            (data['total_outpasses'], data['approved'], data['rejected'], data['returned_on_time'], data['late_returns']),
+            (3, 3, 0, 1, 1),
+        )
+        self.assertEqual(len(data['series']), 3)
+        self.assertEqual(data['by_hostel'][0]['hostel_name'], 'North')
+
+        response = self.client.get('/api/staff/dashboard/reports/', {'period': 'monthly'})
+        self.assertEqual((response.data['total_outpasses'], response.data['rejected']), (4, 1))
+
+        incremental = self.rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollup_rows())
+
+    def test_deadline_edit_moves_completed_outpass(self):
+        self.complete(self.passes[1], late=True)
+        self.passes[1].expected_return_date += datetime.timedelta(days=1)
+        self.passes[1].save()
+        daily = OutpassReportRollup.objects.get(period='DAILY', period_start=self.passes[1].outgoing_date)
+        self.assertEqual((daily.returned_on_time, daily.returned_late), (1, 0))
+
+        incremental = self.rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollup_rows())
+
+    def test_rejects_unknown_period(self):
+        response = self.client.get('/api/staff/dashboard/reports/', {'period': 'hourly'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FastListSerializerTest(TestCase):
+    def setUp(self):
+        hostel = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        room = Room.objects.create(hostel=hostel, room_number='101', floor=1)
+        class_obj = Class.objects.create(name='10th', code='X')
+        section = Section.objects.create(class_obj=class_obj, name='A')
+        parent = make_user('PARENT', first_name='Ravi')
+        full = make_outpass(
+            make_student(hostel, class_obj, section, room, parent), parent, Outpass.Status.COMPLETED,
+            fee_due='150.50', fee_paid=True, fee_paid_at=timezone.now(), actual_return_date=timezone.now(),
+        )
+        Approval.objects.create(outpass=full, approver=make_user('HM', first_name='Meera'), approver_role='HM', status=Approval.Status.APPROVED)
+        Approval.objects.create(outpass=full, approver=None, approver_role='WARDEN')
+        # No class, section, hostel or room and no approvals
+        make_outpass(make_student(parent=parent), parent)
+
+    def assert_same_json(self, serializer_class):
+        queryset = Outpass.objects.order_by('created_at')
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        fast = fast_serializer_for(serializer_class)
+        self.assertEqual(JSONRenderer().render(fast.serialize(fast.values(queryset))), expected)
+
+    def test_dashboard_serializer_output_matches(self):
+        self.assert_same_json(DashboardOutpassSerializer)
+
+    def test_outpass_serializer_output_matches(self):
+        self.assert_same_json(OutpassSerializer)
+
+
+class DashboardETagTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=make_user('GATE_STAFF'))
+        parent = make_user('PARENT')
+        self.outpass = make_outpass(make_student(parent=parent), parent, Outpass.Status.READY_FOR_EXIT)
+
+    def test_unchanged_poll_is_a_single_aggregate(self):
+        first = self.client.get('/api/staff/dashboard/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/staff/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], etag)
+
+    def test_status_change_invalidates(self):
+        etag = self.client.get('/api/staff/dashboard/')['ETag']
+        self.outpass.status = Outpass.Status.CHECKED_OUT
+        self.outpass.save()
+        response = self.client.get('/api/staff/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ChangesFeedTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.north = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        self.south = Hostel.objects.create(name='South', type=Hostel.Types.BOYS)
+        parent = make_user('PARENT')
+        self.mine = make_outpass(make_student(self.north, parent=parent), parent, Outpass.Status.APPROVED)
+        self.other = make_outpass(make_student(self.south, parent=parent), parent, Outpass.Status.APPROVED)
+        self.age(Outpass.objects.all(), minutes=10)
+
+        self.warden = make_user('WARDEN')
+        profile = self.warden.staff_profile
+        profile.assigned_hostel = self.north
+        profile.save()
+        self.client.force_authenticate(user=self.warden)
+
+    def age(self, outpasses, minutes):
+        # Changes are only handed out once they have settled
+        outpasses.update(updated_at=timezone.now() - datetime.timedelta(minutes=minutes))
+
+    def test_returns_only_changes_after_token(self):
+        response = self.client.get('/api/staff/dashboard/changes/')
+        self.assertEqual(response.data['results'], [])
+        token = response.data['next']
+
+        for outpass in (self.mine, self.other):
+            outpass.status = Outpass.Status.READY_FOR_EXIT
+            outpass.save()
+        self.age(Outpass.objects.all(), minutes=5)
+
+        response = self.client.get('/api/staff/dashboard/changes/', {'since': token})
+        self.assertEqual([row['id'] for row in response.data['results']], [str(self.mine.pk)])
+        self.assertEqual(response.data['results'][0]['status'], Outpass.Status.READY_FOR_EXIT)
+        self.assertFalse(response.data['has_more'])
+
+        response = self.client.get('/api/staff/dashboard/changes/', {'since': response.data['next']})
+        self.assertEqual(response.data['results'], [])
+
+    def test_limit_and_invalid_token(self):
+        self.client.force_authenticate(user=make_user('GATE_STAFF'))
+        token = self.client.get('/api/staff/dashboard/changes/').data['next']
+        Outpass.objects.update(updated_at=timezone.now() - datetime.timedelta(minutes=5))
+
+        first = self.client.get('/api/staff/dashboard/changes/', {'since': token, 'limit': 1})
+        self.assertEqual(len(first.data['results']), 1)
+        self.assertTrue(first.data['has_more'])
+        second = self.client.get('/api/staff/dashboard/changes/', {'since': first.data['next'], 'limit': 1})
+        self.assertEqual(len(second.data['results']), 1)
+        self.assertNotEqual(first.data['results'][0]['id'], second.data['results'][0]['id'])
+
+        response = self.client.get('/api/staff/dashboard/changes/', {'since': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/staff/dashboard/changes/', {'since': encode_token(timezone.now(), 'notauuid')})
+        self.assertEqual(response.status_code, 400)
+
+
+class EventStreamTest(TestCase):
+    def setUp(self):
+        self.north = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        self.south = Hostel.objects.create(name='South', type=Hostel.Types.BOYS)
+        self.parent = make_user('PARENT')
+        self.mine = make_outpass(make_student(self.north, parent=self.parent), self.parent, Outpass.Status.APPROVED)
+        self.other = make_outpass(make_student(self.south, parent=self.parent), self.parent, Outpass.Status.APPROVED)
+        self.warden = make_user('WARDEN')
+        profile = self.warden.staff_profile
+        profile.assigned_hostel = self.north
+        profile.save()
+
+    def test_transitions_publish_after_commit(self):
+        published = []
+        with mock.patch.object(get_broker(), 'publish', published.append):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.mine.status = Outpass.Status.READY_FOR_EXIT
+                self.mine.save()
+                self.assertEqual(published, [])
+        self.assertEqual(published, [{
+            'id': str(self.mine.pk), 'old_status': Outpass.Status.APPROVED,
+            'status': Outpass.Status.READY_FOR_EXIT, 'hostel': str(self.north.pk),
+        }])
+
+    def test_visibility_follows_role_and_hostel(self):
+        event = {'id': '1', 'old_status': Outpass.Status.APPROVED, 'status': Outpass.Status.READY_FOR_EXIT, 'hostel': str(self.north.pk)}
+        self.assertTrue(visible_to(event, 'WARDEN', self.north.pk))
+        self.assertFalse(visible_to(event, 'WARDEN', self.south.pk))
+        self.assertTrue(visible_to(event, 'GATE_STAFF', None))
+        self.assertFalse(visible_to(event, 'ACCOUNTANT', None))
+
+    async def test_stream_delivers_visible_events(self):
+        token = str(AccessToken.for_user(self.warden))
+        response = await self.async_client.get('/api/staff/dashboard/events/', {'token': token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+
+        # The stream subscribes while producing its first chunk
+        broker = get_broker()
+        broker.publish({'id': 'x', 'old_status': 'APPROVED', 'status': 'READY_FOR_EXIT', 'hostel': str(self.south.pk)})
+        broker.publish({'id': 'y', 'old_status': 'APPROVED', 'status': 'READY_FOR_EXIT', 'hostel': str(self.north.pk)})
+        chunk = await asyncio.wait_for(anext(chunks), 5)
+        self.assertTrue(chunk.startswith(b'event: status\n'))
+        self.assertIn(b'"id": "y"', chunk)
+        await chunks.aclose()
+
+    def test_requires_staff_token(self):
+        self.assertEqual(self.client.get('/api/staff/dashboard/events/').status_code, 401)
+        token = str(AccessToken.for_user(self.parent))
+        self.assertEqual(self.client.get('/api/staff/dashboard/events/', {'token': token}).status_code, 403)
+
+    def test_refused_outside_asgi(self):
+        token = str(AccessToken.for_user(self.warden))
+        self.assertEqual(self.client.get('/api/staff/dashboard/events/', {'token': token}).status_code, 501)
+
+
+class OutpassHostelTest(TestCase):
+    def setUp(self):
+        self.north = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        self.south = Hostel.objects.create(name='South', type=Hostel.Types.BOYS)
+        self.class_obj = Class.objects.create(name='9th', code='IX')
+        self.parent = make_user('PARENT')
+        self.student = make_student(self.north, self.class_obj, parent=self.parent)
+        self.outpass = make_outpass(self.student, self.parent, Outpass.Status.APPROVED)
+
+    def test_hostel_copied_on_create(self):
+        self.assertEqual(self.outpass.hostel_id, self.north.pk)
+
+    def test_hostel_not_client_writable(self):
+        client = APIClient()
+        client.force_authenticate(user=self.parent)
+        response = client.patch(f'/api/outpasses/{self.outpass.pk}/', {'hostel': self.south.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.outpass.refresh_from_db()
+        self.assertEqual(self.outpass.hostel_id, self.north.pk)
+
+    def test_switching_student_moves_counters(self):
+        sibling = make_student(self.south, parent=self.parent)
+        client = APIClient()
+        client.force_authenticate(user=self.parent)
+        response = client.patch(f'/api/outpasses/{self.outpass.pk}/', {'student': str(sibling.pk)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.outpass.refresh_from_db()
+        self.assertEqual(self.outpass.hostel_id, self.south.pk)
+        self.assertEqual(status_totals(self.north.pk).get(Outpass.Status.APPROVED, 0), 0)
+        self.assertEqual(status_totals(self.south.pk)[Outpass.Status.APPROVED], 1)
+
+        rollups = sorted(OutpassReportRollup.objects.exclude(total=0).values_list('key', 'total', 'approved'))
+        rebuild_rollups()
+        self.assertEqual(rollups, sorted(OutpassReportRollup.objects.exclude(total=0).values_list('key', 'total', 'approved')))
+
+    def test_student_move_follows_to_outpasses_and_counters(self):
+        self.student.hostel = self.south
+        self.student.save()
+
+        self.outpass.refresh_from_db()
+        self.assertEqual(self.outpass.hostel_id, self.south.pk)
+        self.assertEqual(status_totals(self.north.pk).get(Outpass.Status.APPROVED, 0), 0)
+        self.assertEqual(status_totals(self.south.pk)[Outpass.Status.APPROVED], 1)
+        south = OutpassReportRollup.objects.get(period='DAILY', hostel=self.south)
+        self.assertEqual((south.total, south.approved), (1, 1))
+        self.assertFalse(OutpassReportRollup.objects.filter(hostel=self.north).exclude(total=0).exists())
+
+        warden = make_user('WARDEN')
+        profile = warden.staff_profile
+        profile.assigned_hostel = self.south
+        profile.save()
+        client = APIClient()
+        client.force_authenticate(user=warden)
+        response = client.get('/api/staff/dashboard/', {'status': 'in_hostel'})
+        self.assertEqual([row['id'] for row in response.data], [str(self.outpass.pk)])
+
+
+class GateCodeTest(TestCase):
+    def setUp(self):
+        active_codes.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(user=make_user('GATE_STAFF'))
+        self.parent = make_user('PARENT')
+        self.outpass = make_outpass(
+            make_student(parent=self.parent), self.parent, Outpass.Status.READY_FOR_EXIT, exit_code='111111'
+        )
+
+    def test_exit_then_return(self):
+        response = self.client.post('/api/staff/dashboard/gate/process-code/', {'code': '111111'})
+        self.assertEqual(response.data['type'], 'EXIT')
+        return_code = response.data['return_code']
+
+        # Overdue students can still scan back in
+        Outpass.objects.filter(pk=self.outpass.pk).update(status=Outpass.Status.OVERDUE)
+        response = self.client.post('/api/staff/dashboard/gate/process-code/', {'code': return_code})
+        self.assertEqual(response.data['type'], 'ENTRY')
+        self.outpass.refresh_from_db()
+        self.assertEqual(self.outpass.status, Outpass.Status.COMPLETED)
+
+        response = self.client.post('/api/staff/dashboard/gate/process-code/', {'code': '111111'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_resolution_is_one_indexed_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            outpass, direction = resolve_code('111111')
+            self.assertEqual(outpass.student.first_name, self.outpass.student.first_name)
+        self.assertEqual((outpass.pk, direction), (self.outpass.pk, 'EXIT'))
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {ctx.captured_queries[0]['sql']}")
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('outpass_exit_code_idx', plan)
+            self.assertIn('outpass_return_code_idx', plan)
+
+    def test_scan_from_active_code_table_reads_nothing(self):
+        self.assertIsNotNone(active_codes.get('111111'))  # loads the table
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/staff/dashboard/gate/process-code/', {'code': '111111'})
+        self.assertEqual(response.data['student'], self.outpass.student.first_name)
+        outpass_reads = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and '"outpasses_outpass"' in q['sql']]
+        self.assertEqual(outpass_reads, [])
+        self.outpass.refresh_from_db()
+        self.assertEqual(self.outpass.status, Outpass.Status.CHECKED_OUT)
+        self.assertEqual(status_totals()[Outpass.Status.CHECKED_OUT], 1)
+
+    def test_stale_entry_falls_back_to_database(self):
+        entry = active_codes.get('111111')
+        # Another process checked the student out and back in
+        Outpass.objects.filter(pk=self.outpass.pk).update(status=Outpass.Status.COMPLETED)
+        response = self.client.post('/api/staff/dashboard/gate/process-code/', {'code': '111111'})
+        self.assertEqual(response.status_code, 404)
+
+        other = make_outpass(make_student(parent=self.parent), self.parent, Outpass.Status.READY_FOR_EXIT, exit_code='222222')
+        active_codes.put('222222', entry)  # points at the wrong outpass
+        response = self.client.post('/api/staff/dashboard/gate/process-code/', {'code': '222222'})
+        self.assertEqual(response.data['type'], 'EXIT')
+        other.refresh_from_db()
+        self.assertEqual(other.status, Outpass.Status.CHECKED_OUT)
+
+    def test_numeric_code_missing_from_table(self):
+        active_codes.get('111111')  # loads the table before the next outpass exists
+        make_outpass(make_student(parent=self.parent), self.parent, Outpass.Status.READY_FOR_EXIT, exit_code='333333')
+        response = self.client.post('/api/staff/dashboard/gate/process-code/', {'code': 333333}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['type'], 'EXIT')
+
+
+class OfflineGateTest(TestCase):
+    def setUp(self):
+        active_codes.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(user=make_user('GATE_STAFF'))
+        parent = make_user('PARENT')
+        self.leaving = make_outpass(make_student(parent=parent), parent, Outpass.Status.READY_FOR_EXIT, exit_code='333333')
+        self.returning = make_outpass(
+            make_student(parent=parent), parent, Outpass.Status.CHECKED_OUT, return_code='444444',
+            checkout_time=timezone.now() - datetime.timedelta(hours=3),
+        )
+
+    def test_snapshot_lists_live_codes(self):
+        response = self.client.get('/api/staff/dashboard/gate/snapshot/')
+        codes = {item['code']: item['type'] for item in response.data['codes']}
+        self.assertEqual(codes, {'333333': 'EXIT', '444444': 'ENTRY'})
+        self.assertTrue(response.data['token'])
+
+    def test_sync_applies_in_device_order_with_conflicts(self):
+        token = self.client.get('/api/staff/dashboard/gate/snapshot/').data['token']
+        scanned = timezone.now() - datetime.timedelta(minutes=30)
+        scans = [
+            {'id': 'a', 'code': '444444', 'scanned_at': scanned.isoformat()},
+            {'id': 'b', 'code': '333333', 'scanned_at': (scanned - datetime.timedelta(minutes=5)).isoformat()},
+            {'id': 'c', 'code': '333333', 'scanned_at': scanned.isoformat()},
+            {'id': 'd', 'code': '999999', 'scanned_at': scanned.isoformat()},
+            {'id': 'e', 'code': '444444', 'scanned_at': (timezone.now() + datetime.timedelta(hours=1)).isoformat()},
+            {'id': 'f', 'code': '444444', 'scanned_at': '2026-13-45T10:00:00'},
+            {'id': 'g', 'code': ['x'], 'scanned_at': scanned.isoformat()},
+        ]
+        response = self.client.post('/api/staff/dashboard/gate/sync/', {'snapshot': token, 'scans': scans}, format='json')
+        results = {item['id']: item for item in response.data['results']}
+        self.assertEqual([item['id'] for item in response.data['results']], ['a', 'b', 'c', 'd', 'e', 'f', 'g'])
+        self.assertEqual(results['a']['result'], 'applied')
+        self.assertEqual(results['b']['result'], 'applied')
+        self.assertTrue(results['b']['return_code'])
+        self.assertEqual(results['c']['result'], 'conflict')
+        self.assertEqual(results['d']['result'], 'invalid')
+        self.assertEqual(results['e']['result'], 'invalid')
+        self.assertEqual(results['f']['result'], 'invalid')
+        self.assertEqual(results['g']['result'], 'invalid')
+
+        self.leaving.refresh_from_db()
+        self.returning.refresh_from_db()
+        self.assertEqual(self.leaving.status, Outpass.Status.CHECKED_OUT)
+        self.assertEqual(self.leaving.checkout_time, scanned - datetime.timedelta(minutes=5))
+        self.assertEqual(self.returning.actual_return_date, scanned)
+
+    def test_forged_snapshot_rejected(self):
+        response = self.client.post('/api/staff/dashboard/gate/sync/', {'snapshot': 'forged', 'scans': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchGateTest(TestCase):
+    def setUp(self):
+        active_codes.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(user=make_user('GATE_STAFF'))
+        parent = make_user('PARENT')
+        self.leaving = [
+            make_outpass(make_student(parent=parent), parent, Outpass.Status.READY_FOR_EXIT, exit_code=f'50000{i}')
+            for i in range(3)
+        ]
+        self.returning = make_outpass(make_student(parent=parent), parent, Outpass.Status.OVERDUE, return_code='600000')
+
+    def test_burst_applies_with_bulk_updates(self):
+        codes = ['500000', '500001', '500002', '600000', '500000', '999999']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/staff/dashboard/gate/process-codes/', {'codes': codes}, format='json')
+        results = response.data['results']
+
+        self.assertEqual([item.get('type') for item in results], ['EXIT', 'EXIT', 'EXIT', 'ENTRY', None, None])
+        self.assertEqual(len({item['return_code'] for item in results[:3]}), 3)
+        outpass_queries = [q['sql'] for q in ctx.captured_queries if '"outpasses_outpass"' in q['sql'].split(' WHERE')[0]]
+        self.assertEqual(len(outpass_queries), 3)  # one lookup, one UPDATE per direction
+
+        for outpass, item in zip(self.leaving, results):
+            outpass.refresh_from_db()
+            self.assertEqual((outpass.status, outpass.return_code), (Outpass.Status.CHECKED_OUT, item['return_code']))
+        self.returning.refresh_from_db()
+        self.assertEqual(self.returning.status, Outpass.Status.COMPLETED)
+        self.assertEqual(status_totals()[Outpass.Status.CHECKED_OUT], 3)
+
+    def test_numeric_and_padded_codes(self):
+        response = self.client.post('/api/staff/dashboard/gate/process-codes/', {'codes': [500000, ' 600000 ']}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item.get('type') for item in response.data['results']], ['EXIT', 'ENTRY'])
+        bad = self.client.post('/api/staff/dashboard/gate/process-codes/', {'codes': ['500001', None]}, format='json')
+        self.assertEqual(bad.status_code, 400)
+
+
+class SignedPassTest(TestCase):
+    def setUp(self):
+        active_codes.reset()
+        revoked_passes.reset()
+        hostel = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        parent = make_user('PARENT')
+        self.outpass = make_outpass(make_student(hostel=hostel, parent=parent), parent, Outpass.Status.APPROVED)
+        warden = make_user('WARDEN')
+        profile = warden.staff_profile
+        profile.assigned_hostel = hostel
+        profile.save()
+        self.warden = APIClient()
+        self.warden.force_authenticate(user=warden)
+        self.gate = APIClient()
+        self.gate.force_authenticate(user=make_user('GATE_STAFF'))
+
+    def vacate(self):
+        response = self.warden.post(f'/api/staff/dashboard/{self.outpass.pk}/warden_vacate/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['qr_code']
+
+    def test_pass_is_verified_without_reads(self):
+        token = self.vacate()
+        self.assertNotIn(self.outpass.pk, revoked_passes)  # loads the revocation set
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.gate.post('/api/staff/dashboard/gate/scan/', {'qr_code': token})
+        self.assertEqual((response.data['type'], response.data['student']), ('EXIT', self.outpass.student.first_name))
+        reads = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and '"outpasses_outpass"' in q['sql']]
+        self.assertEqual(reads, [])
+
+        # Checkout minted the return pass
+        self.outpass.refresh_from_db()
+        self.assertEqual(self.outpass.status, Outpass.Status.CHECKED_OUT)
+        response = self.gate.post('/api/staff/dashboard/gate/scan/', {'qr_code': self.outpass.qr_code})
+        self.assertEqual(response.data['type'], 'ENTRY')
+        self.outpass.refresh_from_db()
+        self.assertEqual(self.outpass.status, Outpass.Status.COMPLETED)
+
+        response = self.gate.post('/api/staff/dashboard/gate/scan/', {'qr_code': token})
+        self.assertEqual(response.status_code, 409)
+
+    def test_revoked_and_forged_passes_are_refused(self):
+        token = self.vacate()
+        self.assertNotIn(self.outpass.pk, revoked_passes)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.outpass.refresh_from_db()
+            self.outpass.status = Outpass.Status.CANCELLED
+            self.outpass.save()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.gate.post('/api/staff/dashboard/gate/scan/', {'qr_code': token})
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse([q for q in ctx.captured_queries if '"outpasses_outpass"' in q['sql']])
+
+        response = self.gate.post('/api/staff/dashboard/gate/scan/', {'qr_code': token[:-2] + 'xx'})
+        self.assertEqual((response.status_code, response.data['error']), (400, 'Invalid pass'))
+
+    def test_pass_reissued_after_override_approve(self):
+        hm = APIClient()
+        hm.force_authenticate(user=make_user('HM'))
+        stale = self.vacate()
+        self.assertNotIn(self.outpass.pk, revoked_passes)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = hm.post(f'/api/staff/dashboard/{self.outpass.pk}/hm/reject/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.outpass.pk, revoked_passes)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = hm.post(f'/api/staff/dashboard/{self.outpass.pk}/hm/approve/')
+        self.assertEqual(response.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            token = self.vacate()
+
+        response = self.gate.post('/api/staff/dashboard/gate/scan/', {'qr_code': stale})
+        self.assertEqual(response.status_code, 409)
+        response = self.gate.post('/api/staff/dashboard/gate/scan/', {'qr_code': token})
+        self.assertEqual((response.status_code, response.data['type']), (200, 'EXIT'))
+
+
+class TransitionTableTest(TestCase):
+    def setUp(self):
+        self.parent = make_user('PARENT')
+        self.accountant = make_user('ACCOUNTANT')
+
+    def make(self, count, status):
+        return [make_outpass(make_student(parent=self.parent), self.parent, status) for _ in range(count)]
+
+    def test_bulk_transition_is_set_based(self):
+        self.make(3, Outpass.Status.FEE_PENDING)
+        paid = self.make(2, Outpass.Status.PENDING)
+        Approval.objects.create(outpass=paid[0], approver_role='ACCOUNTANT', status=Approval.Status.PENDING)
+
+        with CaptureQueriesContext(connection) as ctx:
+            moved = apply_bulk(TRANSITIONS['accountant_approve'], Outpass.objects.all(), self.accountant)
+        self.assertEqual(len(moved), 5)
+        # SELECT, one UPDATE per source status, counter and rollup upserts, approvals
+        self.assertLessEqual(len(ctx.captured_queries), 14)
+
+        self.assertEqual(Outpass.objects.filter(status=Outpass.Status.PENDING, fee_paid=True).count(), 5)
+        self.assertEqual(status_totals()[Outpass.Status.PENDING], 5)
+        self.assertEqual(status_totals().get(Outpass.Status.FEE_PENDING, 0), 0)
+        approvals = Approval.objects.filter(approver_role='ACCOUNTANT')
+        self.assertEqual(approvals.count(), 5)
+        self.assertFalse(approvals.exclude(status=Approval.Status.APPROVED, approver=self.accountant).exists())
+
+    def test_sources_and_roles_come_from_the_table(self):
+        outpass, = self.make(1, Outpass.Status.PENDING)
+        client = APIClient()
+        client.force_authenticate(user=make_user('WARDEN'))
+        response = client.post(f'/api/staff/dashboard/{outpass.pk}/warden_vacate/')
+        self.assertEqual((response.status_code, response.data['error']), (400, 'Outpass must be APPROVED by HM first'))
+        response = client.post(f'/api/staff/dashboard/{outpass.pk}/hm/approve/')
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkDecisionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.hm = make_user('HM')
+        self.client.force_authenticate(user=self.hm)
+        parent = make_user('PARENT')
+        self.pending = [make_outpass(make_student(parent=parent), parent) for _ in range(30)]
+        Approval.objects.create(outpass=self.pending[0], approver_role='HM', comments='Earlier review')
+
+    def test_bulk_approve_costs_constant_queries(self):
+        ids = [str(outpass.pk) for outpass in self.pending] + ['not-a-uuid', str(uuid.uuid4())]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/staff/dashboard/hm/bulk-decision/', {'ids': ids, 'decision': 'approve'}, format='json')
+        self.assertEqual(response.data['applied'], 30)
+        self.assertEqual(response.data['results'][0], {'id': ids[0], 'status': Outpass.Status.APPROVED})
+        self.assertEqual([item.get('error') for item in response.data['results'][-2:]], ['Invalid id', 'Not found'])
+        outpass_writes = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "outpasses_outpass"')]
+        approval_writes = [q for q in ctx.captured_queries if '"outpasses_approval"' in q['sql']]
+        self.assertEqual((len(outpass_writes), len(approval_writes)), (1, 1))
+
+        self.assertEqual(Outpass.objects.filter(status=Outpass.Status.APPROVED).count(), 30)
+        self.assertEqual(Approval.objects.filter(approver=self.hm, status=Approval.Status.APPROVED).count(), 30)
+        self.assertEqual(Approval.objects.get(outpass=self.pending[0]).comments, 'Earlier review')
+
+    def test_bulk_reject_records_reason(self):
+        ids = [str(outpass.pk) for outpass in self.pending[:2]]
+        response = self.client.post(
+            '/api/staff/dashboard/hm/bulk-decision/', {'ids': ids, 'decision': 'reject', 'reason': 'Exams'}, format='json'
+        )
+        self.assertEqual(response.data['applied'], 2)
+        self.assertEqual(set(Approval.objects.filter(status=Approval.Status.REJECTED).values_list('comments', flat=True)), {'Exams'})
+        self.assertEqual(status_totals()[Outpass.Status.REJECTED], 2)
+
+    def test_bulk_decision_skips_decided_outpasses(self):
+        out, done = self.pending[:2]
+        Outpass.objects.filter(pk=out.pk).update(status=Outpass.Status.CHECKED_OUT)
+        Outpass.objects.filter(pk=done.pk).update(status=Outpass.Status.COMPLETED)
+        ids = [str(out.pk), str(done.pk), str(self.pending[2].pk)]
+        response = self.client.post('/api/staff/dashboard/hm/bulk-decision/', {'ids': ids, 'decision': 'approve'}, format='json')
+        self.assertEqual(response.data['applied'], 1)
+        self.assertEqual(
+            [item.get('error') for item in response.data['results']],
+            ['Outpass is not in a decidable status', 'Outpass is not in a decidable status', None],
+        )
+        statuses = dict(Outpass.objects.filter(pk__in=ids).values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[outpass.pk] for outpass in self.pending[:3]],
+            [Outpass.Status.CHECKED_OUT, Outpass.Status.COMPLETED, Outpass.Status.APPROVED],
+        )
+
+
+class BulkFeeTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.accountant = make_user('ACCOUNTANT')
+        self.client.force_authenticate(user=self.accountant)
+        parent = make_user('PARENT')
+        self.outpasses = [
+            make_outpass(make_student(parent=parent), parent, Outpass.Status.FEE_PENDING, fee_due='1500.00')
+            for _ in range(4)
+        ]
+
+    def test_bulk_clearance_sets_each_amount(self):
+        items = [{'id': str(outpass.pk), 'amount': f'{1000 + i}.50'} for i, outpass in enumerate(self.outpasses)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/staff/dashboard/accountant/bulk-approve/', {'items': items}, format='json')
+        self.assertEqual(response.data['applied'], 4)
+        self.assertEqual(response.data['results'][1], {'id': items[1]['id'], 'status': Outpass.Status.PENDING, 'fee_due': '1001.50'})
+        outpass_writes = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "outpasses_outpass"')]
+        self.assertEqual(len(outpass_writes), 1)
+
+        for outpass, item in zip(self.outpasses, items):
+            outpass.refresh_from_db()
+            self.assertEqual((outpass.status, outpass.fee_paid, str(outpass.fee_due)), (Outpass.Status.PENDING, True, item['amount']))
+            self.assertIsNotNone(outpass.fee_paid_at)
+            approval = Approval.objects.get(outpass=outpass, approver_role='ACCOUNTANT')
+            self.assertEqual((approval.status, str(approval.fee_amount)), (Approval.Status.APPROVED, item['amount']))
+        self.assertEqual(status_totals()[Outpass.Status.PENDING], 4)
+
+    def test_bulk_fee_pending_validates_items(self):
+        response = self.client.post('/api/staff/dashboard/accountant/bulk-fee-pending/', {'items': [{'id': 'x'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        items = [{'id': str(self.outpasses[0].pk), 'amount': '250.00'}, {'id': str(uuid.uuid4()), 'amount': '1.00'}]
+        response = self.client.post('/api/staff/dashboard/accountant/bulk-fee-pending/', {'items': items}, format='json')
+        self.assertEqual([item.get('error') for item in response.data['results']], [None, 'Not found'])
+        self.assertEqual(Approval.objects.get(outpass=self.outpasses[0]).status, Approval.Status.PENDING)
+
+
+class SweeperTest(TestCase):
+    def setUp(self):
+        active_codes.reset()
+        parent = make_user('PARENT')
+        self.today = timezone.localdate()
+        yesterday = self.today - datetime.timedelta(days=1)
+
+        def make(status, return_date, **extra):
+            return make_outpass(
+                make_student(parent=parent), parent, status,
+                outgoing_date=return_date - datetime.timedelta(days=1), expected_return_date=return_date, **extra
+            )
+
+        self.late = make(Outpass.Status.CHECKED_OUT, yesterday, return_code='810000')
+        self.out = make(Outpass.Status.CHECKED_OUT, self.today + datetime.timedelta(days=1))
+        self.unused = make(Outpass.Status.READY_FOR_EXIT, yesterday, exit_code='820000')
+        self.approved = make(Outpass.Status.APPROVED, yesterday)
+        self.pending = make(Outpass.Status.PENDING, yesterday)
+
+    def test_sweep_marks_overdue_and_expired(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep(), {'mark_overdue': 1, 'expire': 2})
+        statuses = dict(Outpass.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[self.late.pk], Outpass.Status.OVERDUE)
+        self.assertEqual(statuses[self.out.pk], Outpass.Status.CHECKED_OUT)
+        self.assertEqual(statuses[self.unused.pk], Outpass.Status.EXPIRED)
+        self.assertEqual(statuses[self.approved.pk], Outpass.Status.EXPIRED)
+        self.assertEqual(statuses[self.pending.pk], Outpass.Status.PENDING)
+        totals = status_totals()
+        self.assertEqual((totals[Outpass.Status.OVERDUE], totals[Outpass.Status.EXPIRED]), (1, 2))
+
+        # The overdue student can still scan back in; the unused exit code is dead
+        self.assertEqual(active_codes.get('810000').status, Outpass.Status.OVERDUE)
+        self.assertIsNone(active_codes.get('820000'))
+        self.assertEqual(sweep(), {'mark_overdue': 0, 'expire': 0})
+
+    def test_sweeper_thread_logs_failures(self):
+        self.assertIsNone(start_configured_sweeper())  # OUTPASS_SWEEP_INTERVAL is off by default
+        # One failing sweep, then the second sleep ends the thread
+        with mock.patch('apps.outpasses.sweeper.sweep', side_effect=RuntimeError('boom')), \
+                mock.patch('apps.outpasses.sweeper.time.sleep', side_effect=[None, SystemExit]), \
+                self.assertLogs('apps.outpasses.sweeper', 'ERROR') as logs:
+            start_sweeper(60).join()
+        self.assertIn('boom', logs.output[0])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Reads SQLite EXPLAIN QUERY PLAN output')
+    def test_due_scans_use_return_deadline_index(self):
+        for name in SWEPT:
+            self.assertIn('outpass_return_deadline_idx', query_plan(due(TRANSITIONS[name].sources, timezone.now())))
+
+
+class OutpassInstantsTest(TestCase):
+    def setUp(self):
+        self.parent = make_user('PARENT')
+        self.now = timezone.localtime()
+        soon = self.now + datetime.timedelta(minutes=30)
+        self.outpass = make_outpass(
+            make_student(parent=self.parent), self.parent, Outpass.Status.APPROVED,
+            outgoing_date=soon.date(), outgoing_time=soon.time().replace(microsecond=0),
+        )
+
+    def test_save_keeps_instants(self):
+        self.outpass.refresh_from_db()
+        self.assertEqual(
+            self.outpass.departure_at,
+            timezone.make_aware(datetime.datetime.combine(self.outpass.outgoing_date, self.outpass.outgoing_time)),
+        )
+        self.outpass.expected_return_date += datetime.timedelta(days=1)
+        self.outpass.save(update_fields=['expected_return_date'])
+        self.outpass.refresh_from_db()
+        self.assertEqual(
+            self.outpass.return_deadline,
+            timezone.make_aware(datetime.datetime.combine(self.outpass.expected_return_date, datetime.time(18))),
+        )
+
+    def test_departing_dashboard_branch(self):
+        later = self.now + datetime.timedelta(hours=3)
+        make_outpass(
+            make_student(parent=self.parent), self.parent, Outpass.Status.APPROVED,
+            outgoing_date=later.date(), outgoing_time=later.time(),
+        )
+        client = APIClient()
+        client.force_authenticate(user=make_user('HM'))
+        response = client.get('/api/staff/dashboard/?status=departing')
+        self.assertEqual([row['id'] for row in response.data], [str(self.outpass.pk)])
+        response = client.get('/api/staff/dashboard/?status=departing&within=240')
+        self.assertEqual(len(response.data), 2)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Reads SQLite EXPLAIN QUERY PLAN output')
+    def test_departing_scan_uses_departure_index(self):
+        now = timezone.now()
+        departing = Outpass.objects.filter(
+            status__in=[Outpass.Status.APPROVED, Outpass.Status.READY_FOR_EXIT],
+            departure_at__gte=now, departure_at__lte=now + datetime.timedelta(hours=1),
+        )
+        self.assertIn('outpass_departure_at_idx', query_plan(departing))
+
+
+class ConditionalTransitionTest(TransactionTestCase):
+    def setUp(self):
+        active_codes.reset()
+        parent = make_user('PARENT')
+        self.outpass = make_outpass(make_student(parent=parent), parent, Outpass.Status.READY_FOR_EXIT, exit_code='700000')
+        self.gates = [make_user('GATE_STAFF') for _ in range(4)]
+
+    def test_parallel_checkouts_apply_once(self):
+        # Every request loads the outpass before any of them writes. SQLite
+        # allows one writer at a time, so the writes are then taken in turn.
+        barrier = threading.Barrier(len(self.gates))
+        writer = threading.Lock()
+        load = StaffDashboardViewSet.get_object
+        statuses = []
+
+        def get_object(view):
+            outpass = load(view)
+            barrier.wait()
+            writer.acquire()
+            return outpass
+
+        def check_out(user):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                response = client.post(f'/api/staff/dashboard/{self.outpass.pk}/gate/checkout/')
+                statuses.append(response.status_code)
+            finally:
+                writer.release()
+                connections.close_all()
+
+        with mock.patch.object(StaffDashboardViewSet, 'get_object', get_object):
+            threads = [threading.Thread(target=check_out, args=(user,)) for user in self.gates]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(statuses), [200, 409, 409, 409])
+        self.outpass.refresh_from_db()
+        self.assertIn(self.outpass.checked_out_by, self.gates)
+        self.assertEqual(status_totals()[Outpass.Status.CHECKED_OUT], 1)
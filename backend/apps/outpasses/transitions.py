@@ -0,0 +1,211 @@
+"""
+The Outpass workflow as one transition table.
+
+Each entry of TRANSITIONS names the statuses it may start from, the status it
+moves to, the roles allowed to trigger it and its side effects: fields to
+set, timestamps to stamp, the field recording who acted and the Approval row
+it leaves. The views only pick a transition and supply request data.
+
+The engine applies a transition to one loaded outpass (apply_transition) or to
+a whole queryset (apply_bulk) with set-based SQL: one UPDATE guarding each row
+by the status it was loaded with, so a concurrent request can't be
+overwritten, and one insert-on-conflict for the Approval rows. A row that
+moved on in between is left out of the result; for a single outpass the views
+answer that with 409.
+"""
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from apps.users.models import User
+from .gate import has_live_code, refresh_codes
+from .models import Approval, Outpass
+from .signals import StatusChange, _student_dims, status_changed
+
+# sources: statuses the transition starts from, None for any.
+# target: the new status, or {source: target} where unlisted sources keep theirs.
+# roles: roles that may trigger it, None for anyone who can see the outpass.
+# approval: Approval.Status recorded under the actor's role, None for no Approval.
+# fields: fixed values to set; stamps: fields set to the time of the transition;
+# actor: field set to the acting user.
+# approval_fields: {Approval field: Outpass field} copied onto the Approval.
+# blocked: error for an outpass in another status, formatted with {status}.
+Transition = namedtuple(
+    'Transition',
+    ['sources', 'target', 'roles', 'approval', 'fields', 'stamps', 'actor', 'approval_fields', 'blocked'],
+    defaults=(None, {}, (), None, {}, 'Outpass cannot move on from {status}'),
+)
+
+S = Outpass.Status
+R = User.Roles
+
+TRANSITIONS = {
+    'cancel': Transition(
+        [S.PENDING, S.FEE_PENDING, S.APPROVED, S.MEETING, S.READY_FOR_EXIT], S.CANCELLED, None,
+        blocked='cannot cancel outpass in {status} status',
+    ),
+    'accountant_approve': Transition(
+        None, {S.FEE_PENDING: S.PENDING}, {R.ACCOUNTANT}, Approval.Status.APPROVED,
+        fields={'fee_paid': True}, stamps=('fee_paid_at',), approval_fields={'fee_amount': 'fee_due'},
+    ),
+    'accountant_fee_pending': Transition(
+        None, S.FEE_PENDING, {R.ACCOUNTANT}, Approval.Status.PENDING, approval_fields={'fee_amount': 'fee_due'},
+    ),
+    'hm_approve': Transition(None, S.APPROVED, {R.HM}, Approval.Status.APPROVED),
+    'hm_reject': Transition(None, S.REJECTED, {R.HM}, Approval.Status.REJECTED),
+    # hm/bulk-decision only decides outpasses still waiting on the HM
+    'hm_bulk_approve': Transition(
+        [S.PENDING, S.FEE_PENDING, S.MEETING], S.APPROVED, {R.HM}, Approval.Status.APPROVED,
+    ),
+    'hm_bulk_reject': Transition(
+        [S.PENDING, S.FEE_PENDING, S.MEETING], S.REJECTED, {R.HM}, Approval.Status.REJECTED,
+    ),
+    'hm_meeting': Transition(None, S.MEETING, {R.HM}, fields={'meeting_scheduled': True}),
+    'hm_cancel_meeting': Transition(
+        None, S.PENDING, {R.HM},
+        fields={'meeting_scheduled': False, 'meeting_date': None, 'meeting_venue': '', 'meeting_notes': ''},
+    ),
+    'warden_reject': Transition(None, S.REJECTED, {R.WARDEN}, Approval.Status.REJECTED),
+    'warden_vacate': Transition(
+        [S.APPROVED], S.READY_FOR_EXIT, {R.WARDEN}, Approval.Status.APPROVED,
+        blocked='Outpass must be APPROVED by HM first',
+    ),
+    'gate_checkout': Transition(
+        [S.READY_FOR_EXIT], S.CHECKED_OUT, {R.GATE_STAFF},
+        stamps=('checkout_time',), actor='checked_out_by',
+        blocked='Outpass not ready for exit (must be marked by Warden first)',
+    ),
+    'mark_returned': Transition(None, S.COMPLETED, {R.HM, R.WARDEN}, stamps=('actual_return_date',)),
+    # Applied by the sweeper (sweeper.py) once the expected return has passed, never by a user
+    'mark_overdue': Transition([S.CHECKED_OUT], S.OVERDUE, set()),
+    'expire': Transition([S.APPROVED, S.READY_FOR_EXIT], S.EXPIRED, set()),
+}
+
+# Largest set a bulk endpoint applies a transition to in one request
+MAX_BULK_OUTPASSES = 500
+
+
+def permits(rule, user):
+    return rule.roles is None or user.role in rule.roles
+
+
+def accepts(rule, status):
+    return rule.sources is None or status in rule.sources
+
+
+def target_for(rule, status):
+    if isinstance(rule.target, dict):
+        return rule.target.get(status, status)
+    return rule.target
+
+
+def apply_transition(rule, outpass, user, comments=None, **fields):
+    """
+    Apply ``rule`` to the loaded ``outpass``, setting ``fields`` as well.
+    Returns False (leaving the instance untouched) when the outpass no longer
+    has the status it was loaded with; otherwise the instance is updated in
+    place.
+    """
+    with transaction.atomic():
+        return bool(_apply(rule, [outpass], user, comments, fields))
+
+
+def apply_bulk(rule, queryset, user, comments=None, row_values=None, **fields):
+    """
+    Apply ``rule`` to every outpass in ``queryset`` it accepts, in one
+    transaction. ``row_values`` sets per-outpass values as ``{field: {pk:
+    value}}``; outpasses missing from a field's map keep their value. Returns
+    the outpasses moved, with their new values.
+    """
+    if rule.sources is not None:
+        queryset = queryset.filter(status__in=rule.sources)
+    with transaction.atomic():
+        outpasses = list(queryset.select_related('student').select_for_update(of=('self',)).order_by())
+        return _apply(rule, outpasses, user, comments, fields, row_values)
+
+
+def _apply(rule, outpasses, user, comments, fields, row_values=None):
+    if not outpasses:
+        return []
+    now = timezone.now()
+    values = {**rule.fields, **{name: now for name in rule.stamps}, **fields}
+    if rule.actor:
+        values[rule.actor] = user
+    row_values = row_values or {}
+    cases = {
+        name: Case(
+            *(When(pk=pk, then=Value(value)) for pk, value in by_pk.items()),
+            default=F(name), output_field=Outpass._meta.get_field(name),
+        )
+        for name, by_pk in row_values.items()
+    }
+
+    # One UPDATE, each row guarded by the status it was loaded with
+    guard = Q()
+    by_status = defaultdict(list)
+    for outpass in outpasses:
+        by_status[outpass.status].append(outpass.pk)
+    for old_status, ids in by_status.items():
+        guard |= Q(pk__in=ids, status=old_status)
+    if isinstance(rule.target, dict):
+        new_status = Case(
+            *(When(status=source, then=Value(target)) for source, target in rule.target.items()),
+            default=F('status'),
+        )
+    else:
+        new_status = rule.target
+
+    updated = Outpass.objects.filter(guard).update(status=new_status, updated_at=now, **values, **cases)
+    if updated != len(outpasses):
+        # Some rows moved on concurrently; keep those this UPDATE wrote
+        ids = [outpass.pk for outpass in outpasses]
+        moved = set(Outpass.objects.filter(pk__in=ids, updated_at=now).values_list('pk', flat=True))
+        outpasses = [outpass for outpass in outpasses if outpass.pk in moved]
+    applied = [(outpass, outpass.status, target_for(rule, outpass.status)) for outpass in outpasses]
+
+    changes = []
+    for outpass, old_status, new_status in applied:
+        outpass.status = new_status
+        outpass.updated_at = now
+        for name, value in values.items():
+            setattr(outpass, name, value)
+        for name, by_pk in row_values.items():
+            if outpass.pk in by_pk:
+                setattr(outpass, name, by_pk[outpass.pk])
+        # Keep the snapshot current so a later save() does not report this change again
+        outpass._loaded_values = {f.attname: getattr(outpass, f.attname) for f in Outpass._meta.concrete_fields}
+        if new_status != old_status:
+            hostel_id, class_id, section_id = _student_dims(outpass)
+            changes.append(StatusChange(
+                outpass.pk, hostel_id, outpass.outgoing_date, old_status, new_status,
+                class_id, section_id, outpass.returned_on_time(),
+            ))
+
+    if changes:
+        status_changed.send(sender=Outpass, changes=changes)
+    live = [outpass.pk for outpass, _, _ in applied if has_live_code(outpass)]
+    if live:
+        refresh_codes(live)
+    if rule.approval and applied:
+        _record_approvals(rule, [outpass for outpass, _, _ in applied], user, comments, now)
+    return [outpass for outpass, _, _ in applied]
+
+
+def _record_approvals(rule, outpasses, user, comments, now):
+    """update_or_create of the actor's Approval on each outpass, as one insert-on-conflict."""
+    defaults = {'approver': user, 'status': rule.approval, 'updated_at': now}
+    if comments is not None:
+        defaults['comments'] = comments
+    Approval.objects.bulk_create(
+        [
+            Approval(
+                outpass_id=outpass.pk, approver_role=user.role, **defaults,
+                **{name: getattr(outpass, source) for name, source in rule.approval_fields.items()},
+            )
+            for outpass in outpasses
+        ],
+        update_conflicts=True, unique_fields=['outpass', 'approver_role'],
+        update_fields=[*defaults, *rule.approval_fields],
+    )
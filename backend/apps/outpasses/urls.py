@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OutpassViewSet, StaffDashboardViewSet
+from .views import OutpassViewSet, StaffDashboardViewSet, dashboard_events
 
 router = DefaultRouter()
 router.register(r'outpasses', OutpassViewSet, basename='outpass')
 router.register(r'staff/dashboard', StaffDashboardViewSet, basename='staff-dashboard')
 
 urlpatterns = [
+    # Ahead of the router so 'events' is not read as an outpass pk
+    path('staff/dashboard/events/', dashboard_events, name='staff-dashboard-events'),
     path('', include(router.urls)),
 ]
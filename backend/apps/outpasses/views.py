@@ -1,58 +1,133 @@
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from apps.users.authentication import ScopedJWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from .models import Outpass, Approval
+from django.db.models import Prefetch
+from .models import Outpass, Approval, OutpassReportRollup
+from .changes import changes_since
+from .events import get_broker, visible_to, RESYNC, STAFF_ROLES
+from .etags import list_etag, etag_matches
+from .fastpath import FastListMixin, fast_serializer_for
+from .gate import normalize_code, scan, scan_many, scan_pass, exit_pass, MAX_BATCH_CODES, build_snapshot, read_snapshot, apply_offline_scans, EXIT, MAX_OFFLINE_SCANS
+from django.core import signing
+from .pagination import OutpassCursorPagination
+from .search import search_outpasses
+from .transitions import TRANSITIONS, MAX_BULK_OUTPASSES, accepts, apply_bulk, apply_transition, permits
+from .counters import status_totals, status_summary
+from .reports import build_report
 from .serializers import (
     OutpassSerializer, DashboardOutpassSerializer, 
-    FeePendingSerializer, MeetingSerializer, VacateSerializer
+    FeePendingSerializer, MeetingSerializer, VacateSerializer, BulkFeeSerializer
 )
 from apps.users.models import User
+from apps.users.scope import get_access_scope
+import asyncio
+import json
 import uuid
 import datetime
 
-class OutpassViewSet(viewsets.ModelViewSet):
+# Minutes ahead the dashboard's ?status=departing looks by default, and at most
+DEPARTING_WINDOW = 60
+MAX_DEPARTING_WINDOW = 24 * 60
+
+
+def _assigned_hostel_id(user):
+    """Hostel a warden's views are scoped to, or None for staff who see every hostel."""
+    return get_access_scope(user).hostel_id
+
+
+def _conflict_response():
+    return Response({'error': 'Outpass was changed by another request; reload and try again'}, status=status.HTTP_409_CONFLICT)
+
+
+def _run_transition(view, request, name, success, fields=None, comments=None):
+    """
+    Apply transition ``name`` (see transitions.TRANSITIONS) to the view's
+    outpass. ``fields`` are extra values to set and ``success`` is the
+    response body; either may be a callable taking the loaded outpass, and
+    ``fields`` may return an error Response instead.
+    """
+    rule = TRANSITIONS[name]
+    if not permits(rule, request.user):
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+    outpass = view.get_object()
+    if not accepts(rule, outpass.status):
+        return Response({'error': rule.blocked.format(status=outpass.status)}, status=status.HTTP_400_BAD_REQUEST)
+    if callable(fields):
+        fields = fields(outpass)
+        if isinstance(fields, Response):
+            return fields
+
+    if not apply_transition(rule, outpass, request.user, comments, **(fields or {})):
+        return _conflict_response()
+    return Response(success(outpass) if callable(success) else success)
+
+
+def _run_bulk_fee_transition(request, name):
+    """
+    Apply an accountant transition to ``items`` (``{id, amount}``) in one
+    transaction: one UPDATE setting each fee_due, one Approval upsert.
+    """
+    rule = TRANSITIONS[name]
+    if not permits(rule, request.user):
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    serializer = BulkFeeSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    amounts = {item['id']: item['amount'] for item in serializer.validated_data['items']}
+    moved = apply_bulk(
+        rule, Outpass.objects.filter(pk__in=amounts), request.user, row_values={'fee_due': amounts}
+    )
+    statuses = {outpass.pk: outpass.status for outpass in moved}
+    results = []
+    for item in serializer.validated_data['items']:
+        if item['id'] in statuses:
+            results.append({'id': str(item['id']), 'status': statuses[item['id']], 'fee_due': str(amounts[item['id']])})
+        else:
+            results.append({'id': str(item['id']), 'error': 'Not found'})
+    return Response({'applied': len(moved), 'results': results})
+
+
+class OutpassViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = OutpassSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OutpassCursorPagination
 
     def get_queryset(self):
         user = self.request.user
+        # OutpassSerializer reads student, class, section and parent names
+        queryset = Outpass.objects.select_related(
+            'student__class_obj', 'student__section', 'parent'
+        )
         if user.role == User.Roles.PARENT:
-            return Outpass.objects.filter(
-                student__parent_relationships__parent=user
-            ).distinct().order_by('-created_at')
-        return Outpass.objects.all()
+            return queryset.filter(
+                student_id__in=get_access_scope(user).student_ids
+            ).order_by('-created_at')
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(parent=self.request.user)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
-        outpass = self.get_object()
-        cancellable_statuses = [
-            Outpass.Status.PENDING, 
-            Outpass.Status.FEE_PENDING, 
-            Outpass.Status.APPROVED, 
-            Outpass.Status.MEETING,
-            Outpass.Status.READY_FOR_EXIT
-        ]
-        if outpass.status in cancellable_statuses:
-            outpass.status = Outpass.Status.CANCELLED
-            outpass.save()
-            return Response({'status': 'outpass cancelled'})
-        return Response({'error': f'cannot cancel outpass in {outpass.status} status'}, status=status.HTTP_400_BAD_REQUEST)
+        return _run_transition(self, request, 'cancel', {'status': 'outpass cancelled'})
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
         from apps.students.models import Student
-        from django.db.models import Count
-        from datetime import timedelta
-        
-        # Simple stats implementation
+
+        totals = status_totals(hostel_id=_assigned_hostel_id(request.user))
         total_students = Student.objects.count()
-        active_outpasses = Outpass.objects.filter(status='OUT').count()
-        pending_approvals = Outpass.objects.filter(status=Outpass.Status.PENDING).count()
-        overdue_returns = Outpass.objects.filter(status='OUT', expected_return_date__lt=timezone.now().date()).count()
+        active_outpasses = totals.get(Outpass.Status.CHECKED_OUT, 0) + totals.get(Outpass.Status.OVERDUE, 0)
+        pending_approvals = totals.get(Outpass.Status.PENDING, 0)
+        overdue_returns = totals.get(Outpass.Status.OVERDUE, 0)
         
         # Empty trends for now to keep it simple or implement if needed
         return Response({
@@ -64,15 +139,28 @@ class OutpassViewSet(viewsets.ModelViewSet):
         })
 
 
-class StaffDashboardViewSet(viewsets.ReadOnlyModelViewSet):
+class StaffDashboardViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = DashboardOutpassSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OutpassCursorPagination
+    TREND_WINDOWS = (7, 30, 90)
 
     def get_queryset(self):
         user = self.request.user
         role = user.role
         queryset = Outpass.objects.all()
 
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+
+        # Eager-load everything DashboardOutpassSerializer touches so that every
+        # branch below costs a fixed number of queries regardless of row count.
+        queryset = queryset.select_related(
+            'student__class_obj', 'student__section', 'student__hostel', 'student__room', 'parent'
+        ).prefetch_related(
+            Prefetch('approvals', queryset=Approval.objects.select_related('approver'))
+        )
+
         if self.action != 'list':
             return queryset
 
@@ -95,15 +183,7 @@ class StaffDashboardViewSet(viewsets.ReadOnlyModelViewSet):
 
         # Handle Search first if provided
         if search_param:
-            from django.db.models import Q
-            queryset = queryset.filter(
-                Q(student__first_name__icontains=search_param) |
-                Q(student__last_name__icontains=search_param) |
-                Q(student__roll_number__icontains=search_param) |
-                Q(student__class_obj__name__icontains=search_param) |
-                Q(student__section__name__icontains=search_param) |
-                Q(student__hostel__name__icontains=search_param)
-            )
+            queryset = search_outpasses(queryset, search_param)
 
         # Precise Filters
         if class_name:
@@ -134,8 +214,20 @@ class StaffDashboardViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(status__in=[Outpass.Status.CHECKED_OUT, Outpass.Status.OVERDUE])
             if date_param:
                 queryset = queryset.filter(expected_return_date=date_param)
-            return queryset.order_by('expected_return_date')
+            return queryset.order_by('return_deadline')
         
+        elif status_param == 'departing':
+            # Leaving within the next ?within= minutes: a range scan of outpass_departure_at_idx per status
+            try:
+                within = min(max(int(self.request.query_params.get('within', DEPARTING_WINDOW)), 0), MAX_DEPARTING_WINDOW)
+            except ValueError:
+                within = DEPARTING_WINDOW
+            now = timezone.now()
+            return queryset.filter(
+                status__in=[Outpass.Status.APPROVED, Outpass.Status.READY_FOR_EXIT],
+                departure_at__gte=now, departure_at__lte=now + datetime.timedelta(minutes=within),
+            ).order_by('departure_at')
+
         elif status_param == 'approved':
             return queryset.filter(status=Outpass.Status.APPROVED).order_by('-updated_at')
         
@@ -162,8 +254,9 @@ class StaffDashboardViewSet(viewsets.ReadOnlyModelViewSet):
             return queryset
 
         if role == User.Roles.WARDEN:
-            if hasattr(user, 'staff_profile') and user.staff_profile.assigned_hostel:
-                queryset = queryset.filter(student__hostel=user.staff_profile.assigned_hostel)
+            hostel_id = _assigned_hostel_id(user)
+            if hostel_id:
+                queryset = queryset.filter(hostel_id=hostel_id)
             
             # Apply dashboard filters only for list action
             if self.action == 'list':
@@ -189,151 +282,105 @@ class StaffDashboardViewSet(viewsets.ReadOnlyModelViewSet):
         
         return queryset.order_by('-created_at')
 
+    def list(self, request, *args, **kwargs):
+        # Dashboards poll this endpoint; unchanged lists are answered with a 304
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = list_etag(request, queryset)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = self.list_response(queryset)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Outpasses changed since ``?since=<token>``, for devices that already
+        hold a dashboard list. Only role scoping applies: an outpass that left
+        a filtered view must still be reported so the client can drop it.
+        """
+        queryset = self.get_queryset()
+        hostel_id = _assigned_hostel_id(request.user)
+        if hostel_id:
+            queryset = queryset.filter(hostel_id=hostel_id)
+
+        try:
+            limit = min(int(request.query_params.get('limit', 200)), 500)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fast = fast_serializer_for(self.get_serializer_class())
+        try:
+            rows, token, has_more = changes_since(queryset, request.query_params.get('since'), limit, fast.values)
+        except ValueError:
+            return Response({'error': 'Invalid since token'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'results': fast.serialize(rows), 'next': token, 'has_more': has_more})
+
     @action(detail=True, methods=['post'], url_path='hm/reject')
     def hm_reject(self, request, pk=None):
-        if request.user.role != User.Roles.HM:
-             return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        reason = request.data.get('reason', 'No reason provided')
-        outpass = self.get_object()
-        outpass.status = Outpass.Status.REJECTED
-        outpass.save() # Could add rejection_reason field to Outpass if needed, currently storing in Approval or assuming logic? 
         # Outpass model doesn't have rejection_reason, but Approval does have 'comments'.
-        
-        Approval.objects.update_or_create(
-            outpass=outpass,
-            approver_role=User.Roles.HM,
-            defaults={
-                'approver': request.user,
-                'status': Approval.Status.REJECTED,
-                'comments': reason
-            }
-        )
-        return Response({'status': 'rejected by HM'})
+        reason = request.data.get('reason', 'No reason provided')
+        return _run_transition(self, request, 'hm_reject', {'status': 'rejected by HM'}, comments=reason)
 
     @action(detail=True, methods=['post'], url_path='accountant/approve')
     def accountant_approve(self, request, pk=None):
-        if request.user.role != User.Roles.ACCOUNTANT:
-            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        outpass = self.get_object()
-        outpass.fee_paid = True
-        outpass.fee_paid_at = timezone.now()
-        if outpass.status == Outpass.Status.FEE_PENDING:
-            outpass.status = Outpass.Status.PENDING
-        outpass.save()
-        
-        Approval.objects.update_or_create(
-            outpass=outpass,
-            approver_role=User.Roles.ACCOUNTANT,
-            defaults={
-                'approver': request.user,
-                'status': Approval.Status.APPROVED
-            }
-        )
-        return Response({'status': 'fee marked paid'})
+        return _run_transition(self, request, 'accountant_approve', {'status': 'fee marked paid'})
 
     @action(detail=True, methods=['post'], url_path='accountant/fee-pending')
     def mark_fee_pending(self, request, pk=None):
-        if request.user.role != User.Roles.ACCOUNTANT:
-           return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        outpass = self.get_object()
-        serializer = FeePendingSerializer(data=request.data)
-        if serializer.is_valid():
-            outpass.fee_due = serializer.validated_data['amount']
-            outpass.status = Outpass.Status.FEE_PENDING
-            outpass.save()
-            return Response({'status': 'marked as fee pending'})
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        def fields(outpass):
+            serializer = FeePendingSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return {'fee_due': serializer.validated_data['amount']}
+
+        return _run_transition(self, request, 'accountant_fee_pending', {'status': 'marked as fee pending'}, fields)
+
+    @action(detail=False, methods=['post'], url_path='accountant/bulk-approve')
+    def accountant_bulk_approve(self, request):
+        """accountant/approve for many outpasses, each with the amount cleared."""
+        return _run_bulk_fee_transition(request, 'accountant_approve')
+
+    @action(detail=False, methods=['post'], url_path='accountant/bulk-fee-pending')
+    def accountant_bulk_fee_pending(self, request):
+        """accountant/fee-pending for many outpasses, each with the amount due."""
+        return _run_bulk_fee_transition(request, 'accountant_fee_pending')
 
     @action(detail=True, methods=['post'], url_path='hm/approve')
     def hm_approve(self, request, pk=None):
-        if request.user.role != User.Roles.HM:
-            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        outpass = self.get_object()
-        # Override logic
-        outpass.status = Outpass.Status.APPROVED
-        outpass.save()
-
-        Approval.objects.update_or_create(
-            outpass=outpass,
-            approver_role=User.Roles.HM,
-            defaults={
-                'approver': request.user,
-                'status': Approval.Status.APPROVED
-            }
-        )
-        return Response({'status': 'approved by HM'})
+        # Override logic: HM may approve from any status
+        return _run_transition(self, request, 'hm_approve', {'status': 'approved by HM'})
 
     @action(detail=True, methods=['post'], url_path='hm/meeting')
     def call_meeting(self, request, pk=None):
-        if request.user.role != User.Roles.HM:
-            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        outpass = self.get_object()
-        serializer = MeetingSerializer(data=request.data)
-        if serializer.is_valid():
-            outpass.meeting_scheduled = True
-            outpass.meeting_date = serializer.validated_data['date']
-            outpass.meeting_venue = serializer.validated_data['venue']
-            outpass.meeting_notes = serializer.validated_data.get('reason', '')
-            outpass.status = Outpass.Status.MEETING
-            outpass.save()
-            return Response({'status': 'meeting scheduled'})
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        def fields(outpass):
+            serializer = MeetingSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return {
+                'meeting_date': serializer.validated_data['date'],
+                'meeting_venue': serializer.validated_data['venue'],
+                'meeting_notes': serializer.validated_data.get('reason', ''),
+            }
+
+        return _run_transition(self, request, 'hm_meeting', {'status': 'meeting scheduled'}, fields)
 
     @action(detail=True, methods=['post'], url_path='mark-returned')
     def mark_returned(self, request, pk=None):
-        if request.user.role not in [User.Roles.HM, User.Roles.WARDEN]:
-            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        outpass = self.get_object()
-        outpass.status = Outpass.Status.COMPLETED
-        outpass.actual_return_date = timezone.now()
-        outpass.save()
-        
-        return Response({'status': f'Marked as returned by {request.user.role}'})
-
-
+        return _run_transition(self, request, 'mark_returned', {'status': f'Marked as returned by {request.user.role}'})
 
     @action(detail=True, methods=['post'], url_path='warden/reject')
     def warden_reject(self, request, pk=None):
-        if request.user.role != User.Roles.WARDEN:
-            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
         reason = request.data.get('reason', 'Rejected by Warden')
-        outpass = self.get_object()
-        outpass.status = Outpass.Status.REJECTED
-        outpass.save()
-
-        Approval.objects.update_or_create(
-            outpass=outpass,
-            approver_role=User.Roles.WARDEN,
-            defaults={
-                'approver': request.user,
-                'status': Approval.Status.REJECTED,
-                'comments': reason
-            }
-        )
-        return Response({'status': 'rejected by Warden'})
+        return _run_transition(self, request, 'warden_reject', {'status': 'rejected by Warden'}, comments=reason)
 
     @action(detail=True, methods=['post'], url_path='gate/checkout')
     def gate_checkout(self, request, pk=None):
-        if request.user.role != User.Roles.GATE_STAFF:
-            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        outpass = self.get_object()
-        if outpass.status != Outpass.Status.READY_FOR_EXIT:
-             return Response({'error': 'Outpass not ready for exit (must be marked by Warden first)'}, status=status.HTTP_400_BAD_REQUEST)
-             
-        outpass.status = Outpass.Status.CHECKED_OUT
-        outpass.checkout_time = timezone.now()
-        outpass.checked_out_by = request.user
-        outpass.save()
-
-        return Response({
+        return _run_transition(self, request, 'gate_checkout', lambda outpass: {
             'status': 'checked out from campus',
             'student_name': outpass.student.first_name,
             'time': outpass.checkout_time
@@ -341,18 +388,51 @@ class StaffDashboardViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=True, methods=['post'], url_path='hm/cancel-meeting')
     def cancel_meeting(self, request, pk=None):
+        return _run_transition(
+            self, request, 'hm_cancel_meeting', {'status': 'Meeting cancelled and outpass reverted to pending'}
+        )
+
+    @action(detail=False, methods=['post'], url_path='hm/bulk-decision')
+    def hm_bulk_decision(self, request):
+        """hm/approve or hm/reject for many outpasses: one UPDATE, one Approval upsert, per-id outcomes."""
         if request.user.role != User.Roles.HM:
             return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        outpass = self.get_object()
-        outpass.meeting_scheduled = False
-        outpass.meeting_date = None
-        outpass.meeting_venue = ''
-        outpass.meeting_notes = ''
-        outpass.status = Outpass.Status.PENDING
-        outpass.save()
-        
-        return Response({'status': 'Meeting cancelled and outpass reverted to pending'})
+
+        decision = request.data.get('decision')
+        if decision not in ('approve', 'reject'):
+            return Response({'error': 'decision must be approve or reject'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids or not all(isinstance(outpass_id, str) for outpass_id in ids):
+            return Response({'error': 'ids must be a non-empty list of outpass ids'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAX_BULK_OUTPASSES:
+            return Response({'error': f'At most {MAX_BULK_OUTPASSES} ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        parsed = {}
+        for outpass_id in ids:
+            try:
+                parsed[outpass_id] = uuid.UUID(outpass_id)
+            except ValueError:
+                parsed[outpass_id] = None
+
+        rule = TRANSITIONS['hm_bulk_approve' if decision == 'approve' else 'hm_bulk_reject']
+        comments = request.data.get('reason', 'No reason provided') if decision == 'reject' else None
+        valid = {pk for pk in parsed.values() if pk}
+        queryset = Outpass.objects.filter(pk__in=valid)
+        moved = {outpass.pk for outpass in apply_bulk(rule, queryset, request.user, comments)}
+        # Tell ids that exist but were past the HM's decision apart from unknown ones
+        existing = moved if moved == valid else set(queryset.values_list('pk', flat=True))
+
+        results = []
+        for outpass_id in ids:
+            if parsed[outpass_id] is None:
+                results.append({'id': outpass_id, 'error': 'Invalid id'})
+            elif parsed[outpass_id] in moved:
+                results.append({'id': outpass_id, 'status': rule.target})
+            elif parsed[outpass_id] in existing:
+                results.append({'id': outpass_id, 'error': 'Outpass is not in a decidable status'})
+            else:
+                results.append({'id': outpass_id, 'error': 'Not found'})
+        return Response({'applied': len(moved), 'results': results})
 
     @action(detail=False, methods=['get'], url_path='reports')
     def reports(self, request):
@@ -360,116 +440,273 @@ class StaffDashboardViewSet(viewsets.ReadOnlyModelViewSet):
              return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
             
         period = request.query_params.get('period', 'daily') # daily, weekly, monthly
-        # Mocking analytics data for now
+        rollup_period = period.upper()
+        if rollup_period not in OutpassReportRollup.Periods.values:
+            return Response({'error': 'period must be daily, weekly or monthly'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Default window: 30 days, 12 weeks or 12 months back from today
+        end = timezone.localdate()
+        start = end - datetime.timedelta(days={'DAILY': 29, 'WEEKLY': 7 * 11, 'MONTHLY': 365}[rollup_period])
+        filters = {}
+        try:
+            if request.query_params.get('start'):
+                start = datetime.date.fromisoformat(request.query_params['start'])
+            if request.query_params.get('end'):
+                end = datetime.date.fromisoformat(request.query_params['end'])
+            for param, field in (('hostel', 'hostel_id'), ('class_obj', 'class_obj_id'), ('section', 'section_id')):
+                if request.query_params.get(param):
+                    filters[field] = uuid.UUID(request.query_params[param])
+        except ValueError:
+            return Response({'error': 'Invalid start, end or filter value'}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = build_report(rollup_period, start, end, **filters)
+        totals = report['totals']
         return Response({
             'period': period,
-            'total_outpasses': Outpass.objects.count(),
-            'approved': Outpass.objects.filter(status=Outpass.Status.APPROVED).count(),
-            'rejected': Outpass.objects.filter(status=Outpass.Status.REJECTED).count(),
-            'returned_on_time': Outpass.objects.filter(status=Outpass.Status.COMPLETED).count(),
-            'late_returns': Outpass.objects.filter(status=Outpass.Status.OVERDUE).count(),
+            'start': start,
+            'end': end,
+            'total_outpasses': totals['total'],
+            'approved': totals['approved'],
+            'rejected': totals['rejected'],
+            'returned_on_time': totals['returned_on_time'],
+            'late_returns': totals['returned_late'],
             'data': [
-                {'name': 'Approved', 'value': 40},
-                {'name': 'Rejected', 'value': 10},
-                {'name': 'Pending', 'value': 20},
-                {'name': 'Returned', 'value': 30},
-            ]
+                {'name': 'Approved', 'value': totals['approved']},
+                {'name': 'Rejected', 'value': totals['rejected']},
+                {'name': 'Returned On Time', 'value': totals['returned_on_time']},
+                {'name': 'Late Returns', 'value': totals['returned_late']},
+            ],
+            'series': report['series'],
+            'by_hostel': report['by_hostel'],
+            'by_class': report['by_class'],
+            'by_section': report['by_section'],
         })
 
     @action(detail=True, methods=['post'], url_path='warden_vacate')
     def warden_vacate(self, request, pk=None):
-        if request.user.role != User.Roles.WARDEN:
-            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-        
-        outpass = self.get_object()
-        if outpass.status != Outpass.Status.APPROVED:
-            return Response({'error': 'Outpass must be APPROVED by HM first'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        outpass.status = Outpass.Status.READY_FOR_EXIT
-        # Generate 6-digit Exit Code (Random digits)
-        import random
-        outpass.exit_code = str(random.randint(100000, 999999))
-        
-        photo_url = request.data.get('verification_photo')
-        if photo_url:
-            outpass.verification_photo = photo_url
-            
-        outpass.save()
-        
-        Approval.objects.update_or_create(
-            outpass=outpass,
-            approver_role=User.Roles.WARDEN,
-            defaults={
-                'approver': request.user,
-                'status': Approval.Status.APPROVED
+        def fields(outpass):
+            # Generate 6-digit Exit Code (Random digits)
+            import random
+            exit_code = str(random.randint(100000, 999999))
+            fields = {
+                'exit_code': exit_code,
+                # Signed exit pass for the QR scanner; verified at the gate without a lookup
+                'qr_code': exit_pass(outpass, exit_code),
+                'qr_generated_at': timezone.now(),
             }
-        )
-        return Response({'status': 'vacated and exit code generated', 'exit_code': outpass.exit_code})
+            photo_url = request.data.get('verification_photo')
+            if photo_url:
+                fields['verification_photo'] = photo_url
+            return fields
+
+        return _run_transition(self, request, 'warden_vacate', lambda outpass: {
+            'status': 'vacated and exit code generated', 'exit_code': outpass.exit_code, 'qr_code': outpass.qr_code,
+        }, fields)
+
+    @action(detail=False, methods=['post'], url_path='gate/scan')
+    def gate_scan(self, request):
+        """gate/process-code for a signed QR pass, verified by its signature alone."""
+        if request.user.role != User.Roles.GATE_STAFF:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        token = request.data.get('qr_code')
+        if not token or not isinstance(token, str):
+            return Response({'error': 'QR code required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            entry, return_code = scan_pass(token, request.user)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if entry is None:
+            return Response({'error': 'Pass is no longer valid'}, status=status.HTTP_409_CONFLICT)
+
+        if entry.direction == EXIT:
+            return Response({'status': 'Student Checked OUT', 'type': 'EXIT', 'student': entry.student_name, 'return_code': return_code})
+        return Response({'status': 'Student Checked IN (Returned)', 'type': 'ENTRY', 'student': entry.student_name})
 
     @action(detail=False, methods=['post'], url_path='gate/process-code')
     def gate_process_code(self, request):
         if request.user.role != User.Roles.GATE_STAFF:
             return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
         
-        code = request.data.get('code')
+        code = normalize_code(request.data.get('code'))
         if not code:
             return Response({'error': 'Code required'}, status=status.HTTP_400_BAD_REQUEST)
             
-        # Try finding as Exit Code (Student Leaving)
-        try:
-            outpass = Outpass.objects.get(exit_code=code, status=Outpass.Status.READY_FOR_EXIT)
-            outpass.status = Outpass.Status.CHECKED_OUT
-            outpass.checkout_time = timezone.now()
-            outpass.checked_out_by = request.user
-            
-            # Generate Return Code
-            import random
-            outpass.return_code = str(random.randint(100000, 999999))
-            
-            outpass.save()
-            return Response({'status': 'Student Checked OUT', 'type': 'EXIT', 'student': outpass.student.first_name, 'return_code': outpass.return_code})
-            
-        except Outpass.DoesNotExist:
-            pass
-            
-        # Try finding as Return Code (Student Returning)
-        try:
-            outpass = Outpass.objects.get(return_code=code, status=Outpass.Status.CHECKED_OUT)
-            outpass.status = Outpass.Status.COMPLETED
-            outpass.actual_return_date = timezone.now()
-            outpass.save()
-            return Response({'status': 'Student Checked IN (Returned)', 'type': 'ENTRY', 'student': outpass.student.first_name})
-            
-        except Outpass.DoesNotExist:
-             return Response({'error': 'Invalid Code'}, status=status.HTTP_404_NOT_FOUND)
+        # Looked up in the active-code table and committed with one conditional UPDATE
+        entry, return_code = scan(code, request.user)
+        if entry is None:
+            return Response({'error': 'Invalid Code'}, status=status.HTTP_404_NOT_FOUND)
+
+        if entry.direction == EXIT:
+            # Student Leaving
+            return Response({'status': 'Student Checked OUT', 'type': 'EXIT', 'student': entry.student_name, 'return_code': return_code})
+
+        # Student Returning
+        return Response({'status': 'Student Checked IN (Returned)', 'type': 'ENTRY', 'student': entry.student_name})
+
+    @action(detail=False, methods=['post'], url_path='gate/process-codes')
+    def gate_process_codes(self, request):
+        """gate/process-code for a burst of codes: one lookup, bulk transitions, per-code outcomes."""
+        if request.user.role != User.Roles.GATE_STAFF:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        codes = request.data.get('codes')
+        if isinstance(codes, list):
+            # Same normalisation as gate/process-code
+            codes = [normalize_code(code) if isinstance(code, (str, int)) else '' for code in codes]
+        if not isinstance(codes, list) or not codes or not all(codes):
+            return Response({'error': 'codes must be a non-empty list of codes'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(codes) > MAX_BATCH_CODES:
+            return Response({'error': f'At most {MAX_BATCH_CODES} codes per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        applied = scan_many(codes, request.user)
+        results = []
+        seen = set()
+        for code in codes:
+            if code in seen or code not in applied:
+                results.append({'code': code, 'error': 'Invalid Code'})
+            else:
+                entry, return_code = applied[code]
+                if entry.direction == EXIT:
+                    results.append({'code': code, 'status': 'Student Checked OUT', 'type': 'EXIT', 'student': entry.student_name, 'return_code': return_code})
+                else:
+                    results.append({'code': code, 'status': 'Student Checked IN (Returned)', 'type': 'ENTRY', 'student': entry.student_name})
+            seen.add(code)
+        return Response({'results': results})
+
+    @action(detail=False, methods=['get'], url_path='gate/snapshot')
+    def gate_snapshot(self, request):
+        """Signed list of live exit and return codes for a gate device going offline."""
+        if request.user.role != User.Roles.GATE_STAFF:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        filters = {}
+        hostel = request.query_params.get('hostel')
+        if hostel:
+            try:
+                filters['hostel_id'] = uuid.UUID(hostel)
+            except ValueError:
+                return Response({'error': 'Invalid hostel'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(build_snapshot(**filters))
+
+    @action(detail=False, methods=['post'], url_path='gate/sync')
+    def gate_sync(self, request):
+        """Apply scans recorded offline; one result per scan, conflicts included."""
+        if request.user.role != User.Roles.GATE_STAFF:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        scans = request.data.get('scans')
+        if not isinstance(scans, list) or not all(isinstance(item, dict) for item in scans):
+            return Response({'error': 'scans must be a list of objects'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(scans) > MAX_OFFLINE_SCANS:
+            return Response({'error': f'At most {MAX_OFFLINE_SCANS} scans per upload'}, status=status.HTTP_400_BAD_REQUEST)
+
+        snapshot_codes = None
+        if request.data.get('snapshot'):
+            try:
+                snapshot_codes = read_snapshot(request.data['snapshot'])
+            except signing.BadSignature:
+                return Response({'error': 'Invalid or expired snapshot'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = apply_offline_scans(scans, request.user, snapshot_codes)
+        return Response({'results': results})
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        from django.db.models import Count
-        from datetime import date, timedelta
-
-        # General stats for Staff
-        total_outpasses = Outpass.objects.count()
-        pending = Outpass.objects.filter(status=Outpass.Status.PENDING).count()
-        approved = Outpass.objects.filter(status=Outpass.Status.APPROVED).count()
-        out = Outpass.objects.filter(status=Outpass.Status.CHECKED_OUT).count()
-        overdue = Outpass.objects.filter(status=Outpass.Status.OVERDUE).count()
-
-        # Simple trend data (last 7 days)
-        last_7_days = []
-        for i in range(7):
-            day = date.today() - timedelta(days=i)
-            count = Outpass.objects.filter(outgoing_date=day).count()
-            last_7_days.append({
+        from datetime import timedelta
+
+        # ?days=7|30|90 sets the trend window; every option costs one query
+        try:
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            days = None
+        if days not in self.TREND_WINDOWS:
+            return Response({'error': f'days must be one of {self.TREND_WINDOWS}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        hostel_id = _assigned_hostel_id(request.user) or request.query_params.get('hostel')
+        if hostel_id:
+            try:
+                hostel_id = uuid.UUID(str(hostel_id))
+            except ValueError:
+                return Response({'error': 'Invalid hostel'}, status=status.HTTP_400_BAD_REQUEST)
+        today = timezone.localdate()
+        start = today - timedelta(days=days - 1)
+        statuses = [Outpass.Status.PENDING, Outpass.Status.APPROVED, Outpass.Status.CHECKED_OUT, Outpass.Status.OVERDUE]
+        totals, trend = status_summary(start, today, hostel_id=hostel_id, statuses=statuses)
+
+        trends = []
+        for i in range(days):
+            day = start + timedelta(days=i)
+            trends.append({
                 'date': day.strftime('%m-%d'),
-                'count': count
+                'count': trend.get(day, 0)
             })
         
         return Response({
-            'total': total_outpasses,
-            'pending': pending,
-            'approved': approved,
-            'active': out,
-            'overdue': overdue,
-            'trends': last_7_days[::-1] # Reverse to chronological
+            'total': totals['total'],
+            'pending': totals[Outpass.Status.PENDING],
+            'approved': totals[Outpass.Status.APPROVED],
+            'active': totals[Outpass.Status.CHECKED_OUT],
+            'overdue': totals[Outpass.Status.OVERDUE],
+            'trends': trends # Chronological
         })
+
+
+EVENT_HEARTBEAT_SECONDS = 15
+
+
+def _authenticate_event_request(request):
+    """
+    The JWT user of an event stream request. Browsers' EventSource cannot set
+    headers, so the access token may also be passed as ``?token=``.
+    """
+    auth = ScopedJWTAuthentication()
+    raw_token = request.GET.get('token')
+    try:
+        if raw_token:
+            return auth.get_user(auth.get_validated_token(raw_token))
+        result = auth.authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+async def dashboard_events(request):
+    """
+    Server-sent events for staff dashboards: one ``status`` event per outpass
+    transition the user's role and hostel may see, plus periodic heartbeats.
+    """
+    user = await sync_to_async(_authenticate_event_request)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if user.role not in STAFF_ROLES:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    if not isinstance(request, ASGIRequest):
+        # A WSGI server would drain the endless stream into one response and tie up its worker
+        return JsonResponse({'error': 'The event stream needs the server to run under ASGI'}, status=501)
+    hostel_id = await sync_to_async(_assigned_hostel_id)(user)
+
+    async def stream():
+        broker = get_broker()
+        subscription = broker.subscribe()
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': heartbeat\n\n'
+                    continue
+                if event == RESYNC:
+                    yield 'event: resync\ndata: {}\n\n'
+                elif visible_to(event, user.role, hostel_id):
+                    yield f'event: status\ndata: {json.dumps(event)}\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
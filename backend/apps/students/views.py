@@ -7,6 +7,7 @@ from rest_framework.decorators import action
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter
+from apps.users.scope import get_access_scope
 
 User = get_user_model()
 
@@ -46,7 +47,7 @@ class StudentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'PARENT':
-            return Student.objects.filter(parent_relationships__parent=user)
+            return Student.objects.filter(pk__in=get_access_scope(user).student_ids)
         return Student.objects.all()
     serializer_class = StudentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -61,7 +62,7 @@ class GuardianViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'PARENT':
-            return Guardian.objects.filter(student__parent_relationships__parent=user).distinct()
+            return Guardian.objects.filter(student_id__in=get_access_scope(user).student_ids)
         return Guardian.objects.all()
 
     def create(self, request, *args, **kwargs):
@@ -0,0 +1,19 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .scope import SCOPE_CLAIM, VERSION_CLAIM, scope_from_claims
+
+
+class ScopedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that attaches the AccessScope minted into the token, so
+    a request needs no scope queries. The user itself is still loaded on every
+    request: is_active, role and scope_version must be current in every
+    worker, and a token's scope claims only count while its scope_version is.
+    """
+
+    def get_user(self, validated_token):
+        # One primary-key lookup; raises for unknown and inactive users
+        user = super().get_user(validated_token)
+        claims = validated_token.get(SCOPE_CLAIM)
+        if claims is not None and validated_token.get(VERSION_CLAIM) == user.scope_version:
+            user.access_scope = scope_from_claims(claims)
+        return user
@@ -23,6 +23,8 @@ class User(AbstractUser):
     department = models.CharField(max_length=100, blank=True, null=True)
     
     is_verified = models.BooleanField(default=False)
+    # Bumped when the role, hostel or linked students change; see apps.users.scope
+    scope_version = models.PositiveIntegerField(default=0)
     
     # Use phone as username
     username = None
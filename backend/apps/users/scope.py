@@ -0,0 +1,80 @@
+"""
+Per-user access scope.
+
+What a user may see is decided by their role, a warden's assigned hostel and
+a parent's linked students. Loading that on every request costs a
+staff_profile lookup or a join through StudentParentRelationship, so the
+scope is minted into the JWT at login (``tokens_for``) and read back by
+ScopedJWTAuthentication.
+
+User.scope_version is bumped whenever any of those inputs change. A token
+minted under an older version is still valid, but its scope claims are
+ignored and the scope is rebuilt from the database.
+"""
+import uuid
+from collections import namedtuple
+
+from django.db.models import F
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# hostel_id is the warden's assigned hostel (None for everyone else) and
+# student_ids the students linked to a parent (empty for staff).
+AccessScope = namedtuple('AccessScope', ['role', 'hostel_id', 'student_ids'])
+
+SCOPE_CLAIM = 'scope'
+VERSION_CLAIM = 'scope_version'
+
+def build_scope(user):
+    """Load ``user``'s scope from the database."""
+    from apps.students.models import StudentParentRelationship
+    from .models import StaffProfile
+
+    hostel_id = None
+    student_ids = frozenset()
+    if user.role == user.Roles.WARDEN:
+        hostel_id = StaffProfile.objects.filter(user_id=user.pk).values_list('assigned_hostel_id', flat=True).first()
+    elif user.role == user.Roles.PARENT:
+        student_ids = frozenset(
+            StudentParentRelationship.objects.filter(parent_id=user.pk).values_list('student_id', flat=True)
+        )
+    return AccessScope(user.role, hostel_id, student_ids)
+
+
+def scope_to_claims(scope):
+    return {
+        'role': scope.role,
+        'hostel': str(scope.hostel_id) if scope.hostel_id else None,
+        'students': sorted(str(student_id) for student_id in scope.student_ids),
+    }
+
+
+def scope_from_claims(claims):
+    return AccessScope(
+        claims['role'],
+        uuid.UUID(claims['hostel']) if claims['hostel'] else None,
+        frozenset(uuid.UUID(student_id) for student_id in claims['students']),
+    )
+
+
+def tokens_for(user):
+    """A RefreshToken for ``user`` carrying its scope; the access token inherits the claims."""
+    refresh = RefreshToken.for_user(user)
+    refresh[SCOPE_CLAIM] = scope_to_claims(build_scope(user))
+    refresh[VERSION_CLAIM] = user.scope_version
+    return refresh
+
+
+def get_access_scope(user):
+    """
+    ``user``'s AccessScope. Users authenticated by ScopedJWTAuthentication
+    carry it already; for any other user (sessions, force_authenticate) it is
+    loaded from the database.
+    """
+    scope = getattr(user, 'access_scope', None)
+    return scope if scope is not None else build_scope(user)
+
+
+def bump_scope_version(user_id):
+    """Invalidate the scope claims of every token issued to ``user_id``."""
+    from .models import User
+    User.objects.filter(pk=user_id).update(scope_version=F('scope_version') + 1)
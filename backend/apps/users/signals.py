@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from apps.students.models import StudentParentRelationship
 from .models import StaffProfile, ParentProfile
+from .scope import bump_scope_version
 
 User = get_user_model()
 
@@ -21,3 +23,27 @@ def save_user_profile(sender, instance, **kwargs):
     elif instance.role in ['WARDEN', 'HM', 'ACCOUNTANT', 'GATE_STAFF']:
         if hasattr(instance, 'staff_profile'):
             instance.staff_profile.save()
+
+# Access scope invalidation (see apps.users.scope)
+
+@receiver(pre_save, sender=User)
+def bump_scope_on_role_change(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    old_role = User.objects.filter(pk=instance.pk).values_list('role', flat=True).first()
+    if old_role is not None and old_role != instance.role:
+        instance.scope_version += 1
+
+@receiver(pre_save, sender=StaffProfile)
+def remember_assigned_hostel(sender, instance, **kwargs):
+    instance._old_hostel_id = StaffProfile.objects.filter(pk=instance.pk).values_list('assigned_hostel_id', flat=True).first()
+
+@receiver(post_save, sender=StaffProfile)
+def bump_scope_on_hostel_change(sender, instance, **kwargs):
+    if instance._old_hostel_id != instance.assigned_hostel_id:
+        bump_scope_version(instance.user_id)
+
+@receiver(post_save, sender=StudentParentRelationship)
+@receiver(post_delete, sender=StudentParentRelationship)
+def bump_scope_on_relationship_change(sender, instance, **kwargs):
+    bump_scope_version(instance.parent_id)
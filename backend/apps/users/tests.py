@@ -1,3 +1,77 @@
+import datetime
+
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.housing.models import Hostel
+from apps.students.models import Student, StudentParentRelationship
+from apps.users.models import User
+from apps.users.scope import get_access_scope
+
+
+class AccessScopeTokenTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.hostel = Hostel.objects.create(name='North', type=Hostel.Types.BOYS)
+        self.parent = User.objects.create_user(phone='9100000001', password='secret', role=User.Roles.PARENT)
+        self.student = self.make_student('1')
+
+    def make_student(self, n):
+        student = Student.objects.create(
+            student_id=f'SC{n}', admission_number=f'SCADM{n}', first_name=f'Scope{n}', last_name='Test',
+            date_of_birth=datetime.date(2010, 1, 1), gender='M', roll_number=n,
+            hostel=self.hostel, admission_date=datetime.date(2020, 6, 1),
+        )
+        StudentParentRelationship.objects.create(student=student, parent=self.parent, relationship='FATHER')
+        return student
+
+    def login(self, phone):
+        response = self.client.post('/api/auth/login/', {'phone': phone, 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        return response.data['access']
+
+    def test_scoped_requests_need_no_scope_queries(self):
+        token = self.login('9100000001')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/outpasses/')
+        self.assertEqual(response.status_code, 200)
+        # The user by primary key, then the outpass list filtered by the student ids in the token
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertIn(self.student.pk.hex, ctx.captured_queries[1]['sql'])
+
+    def test_changes_made_elsewhere_apply_to_the_next_request(self):
+        # A queryset update sends no signals, like a save in another worker
+        token = self.login('9100000001')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get('/api/students/').status_code, 200)
+
+        User.objects.filter(pk=self.parent.pk).update(role=User.Roles.GATE_STAFF, scope_version=F('scope_version') + 1)
+        response = self.client.get('/api/outpasses/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user.role, User.Roles.GATE_STAFF)
+        self.assertIsNone(getattr(response.wsgi_request.user, 'access_scope', None))
+
+        User.objects.filter(pk=self.parent.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/outpasses/').status_code, 401)
+
+    def test_new_link_invalidates_token_scope(self):
+        token = self.login('9100000001')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        other = self.make_student('2')
+
+        response = self.client.get('/api/students/')
+        self.assertEqual({row['id'] for row in response.data}, {str(self.student.pk), str(other.pk)})
 
-# Create your tests here.
+    def test_warden_hostel_change_bumps_version(self):
+        warden = User.objects.create_user(phone='9100000002', password='secret', role=User.Roles.WARDEN)
+        version = warden.scope_version
+        profile = warden.staff_profile
+        profile.assigned_hostel = self.hostel
+        profile.save()
+        warden.refresh_from_db()
+        self.assertEqual(warden.scope_version, version + 1)
+        self.assertEqual(get_access_scope(warden).hostel_id, self.hostel.pk)
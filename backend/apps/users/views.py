@@ -4,9 +4,9 @@ from django.utils import timezone
 from django.http import HttpResponse
 from rest_framework import status, views
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from .models import OtpVerification, StaffProfile, ParentProfile
+from .scope import tokens_for
 from .serializers import (
     LoginSerializer, OtpVerifySerializer, 
     ChangePasswordSerializer, PasswordResetSerializer
@@ -35,7 +35,7 @@ class AdminLoginView(views.APIView):
             if user.role not in allowed_roles:
                  return Response({"error": "Access denied. Admin portal is for staff/admin only."}, status=status.HTTP_403_FORBIDDEN)
             
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -68,7 +68,7 @@ class PasswordLoginView(views.APIView):
             if role and user.role != role:
                  return Response({"error": f"User is not a {role}"}, status=status.HTTP_403_FORBIDDEN)
 
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -162,7 +162,7 @@ class VerifyOtpView(views.APIView):
                 user.is_verified = True
                 user.save()
                 
-                refresh = RefreshToken.for_user(user)
+                refresh = tokens_for(user)
                 return Response({
                     'refresh': str(refresh),
                     'access': str(refresh.access_token),
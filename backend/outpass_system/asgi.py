@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'outpass_system.settings')
 
 application = get_asgi_application()
+
+# Only server processes sweep; management commands never import this module
+from apps.outpasses.sweeper import start_configured_sweeper  # noqa: E402
+
+start_configured_sweeper()
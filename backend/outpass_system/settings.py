@@ -92,7 +92,10 @@ DATABASES = {
 }
 
 # Render Database Configuration
-db_from_env = dj_database_url.config(conn_max_age=600)
+# The Procfile serves the app under ASGI, where Django advises against
+# persistent connections: each request may run on a different thread, so
+# they are closed after every request instead of being reused.
+db_from_env = dj_database_url.config(conn_max_age=0)
 DATABASES['default'].update(db_from_env)
 
 
@@ -102,7 +105,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.ScopedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -113,6 +116,12 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Outpass sweeper (apps.outpasses.sweeper)
+# Seconds between in-process sweeps marking outpasses OVERDUE/EXPIRED; 0 disables them.
+# Every gunicorn worker would start its own sweeper, so enable this on one
+# process only, or leave it off and run ``manage.py sweep_outpasses`` from cron.
+OUTPASS_SWEEP_INTERVAL = int(os.environ.get('OUTPASS_SWEEP_INTERVAL', 0))
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = True  # specific origins in production
 